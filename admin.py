@@ -0,0 +1,237 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from flask import current_app
+from app import create_app, db
+from app import bulk
+from app.models import User, FocusRoom
+
+# 一覧表示で1度に読み込む行数
+YIELD_PER = 500
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def _filter_ids(query, column, args):
+    if args.min_id is not None:
+        query = query.filter(column >= args.min_id)
+    if args.max_id is not None:
+        query = query.filter(column <= args.max_id)
+    return query
+
+def list_users(args):
+    """
+    ユーザーを ID 順にストリーミングで一覧表示します。
+    """
+    query = _filter_ids(User.query, User.id, args)
+    if args.inactive_since:
+        query = query.filter(User.id.in_(bulk.inactive_users(args.inactive_since)))
+
+    count = 0
+    print("--- ユーザー一覧 ---")
+    for user in query.order_by(User.id).yield_per(YIELD_PER):
+        print(f"ID: {user.id}, ユーザー名: {user.username}, メールアドレス: {user.email}")
+        count += 1
+    print("---------------------")
+    print(f"合計ユーザー数: {count}")
+
+def list_rooms(args):
+    """
+    ルームをオーナーと一緒に読み込み、ID 順にストリーミングで一覧表示します。
+    """
+    query = _filter_ids(FocusRoom.query, FocusRoom.id, args).options(db.joinedload(FocusRoom.owner))
+
+    count = 0
+    print("--- フォーカスルーム一覧 ---")
+    for room in query.order_by(FocusRoom.id).yield_per(YIELD_PER):
+        print(f"ID: {room.id}, 名前: {room.name}, オーナー: {room.owner.username}, 公開: {room.is_public}")
+        count += 1
+    print("--------------------------")
+    print(f"合計ルーム数: {count}")
+
+def _target_user_ids(args):
+    query = db.session.query(User.id)
+    if args.id:
+        query = query.filter(User.id.in_(args.id))
+    if args.email:
+        query = query.filter(User.email == args.email)
+    if args.username:
+        query = query.filter(User.username == args.username)
+    if args.inactive_since:
+        query = query.filter(User.id.in_(bulk.inactive_users(args.inactive_since)))
+    query = _filter_ids(query, User.id, args)
+    return [row[0] for row in query.order_by(User.id)]
+
+def _target_room_ids(args):
+    query = db.session.query(FocusRoom.id)
+    if args.id:
+        query = query.filter(FocusRoom.id.in_(args.id))
+    if args.name:
+        query = query.filter(FocusRoom.name == args.name)
+    query = _filter_ids(query, FocusRoom.id, args)
+    return [row[0] for row in query.order_by(FocusRoom.id)]
+
+def delete_users(args):
+    """
+    条件に一致するユーザーを関連データごと、チャンク単位のトランザクションで削除します。
+    """
+    if not (args.id or args.email or args.username or args.inactive_since
+            or args.min_id is not None or args.max_id is not None):
+        print("エラー: 削除するユーザーの条件を1つ以上指定してください。")
+        return
+
+    user_ids = _target_user_ids(args)
+    if not user_ids:
+        print("条件に一致するユーザーは見つかりませんでした。")
+        return
+    if args.dry_run:
+        print(f"削除対象のユーザー: {len(user_ids)} 人 (ID {user_ids[0]}〜{user_ids[-1]})")
+        return
+
+    def on_chunk(chunk, owned_rooms):
+        # Web サーバーのキャッシュは bulk が進める版数で CACHE_STAMP_INTERVAL 以内に破棄される
+        print(f"  {len(chunk)} 人を削除しました (ID {chunk[0]}〜{chunk[-1]}, ルーム {len(owned_rooms)} 件)")
+
+    deleted_users, deleted_rooms = bulk.delete_users(user_ids, chunk_size=args.chunk_size, on_chunk=on_chunk)
+    print(f"ユーザー {deleted_users} 人とルーム {deleted_rooms} 件を削除しました。")
+
+def delete_rooms(args):
+    """
+    条件に一致するルームをチャット・参加者ごと、チャンク単位のトランザクションで削除します。
+    """
+    if not (args.id or args.name or args.min_id is not None or args.max_id is not None):
+        print("エラー: 削除するルームの条件を1つ以上指定してください。")
+        return
+
+    room_ids = _target_room_ids(args)
+    if not room_ids:
+        print("条件に一致するルームは見つかりませんでした。")
+        return
+    if args.dry_run:
+        print(f"削除対象のルーム: {len(room_ids)} 件 (ID {room_ids[0]}〜{room_ids[-1]})")
+        return
+
+    def on_chunk(chunk):
+        print(f"  {len(chunk)} 件を削除しました (ID {chunk[0]}〜{chunk[-1]})")
+
+    deleted = bulk.delete_rooms(room_ids, chunk_size=args.chunk_size, on_chunk=on_chunk)
+    print(f"ルーム {deleted} 件を削除しました。")
+
+def compact(args):
+    """
+    古い ActivityLog を日別集計にまとめ、ルームごとのチャット件数を上限まで減らします。
+    """
+    from app import retention
+    result = retention.run(current_app, activity_days=args.activity_days, chat_per_room=args.chat_per_room,
+                           batch_size=args.batch_size, archive_dir=args.archive_dir)
+    print(f"アクティビティ: {result['activity_compacted']} 行を {result['summaries_created']} 件の日別集計にまとめました "
+          f"({result['activity_seconds']}秒)")
+    print(f"チャット: {result['chat_deleted']} 行を削除しました ({result['chat_seconds']}秒)")
+    print(f"冪等性キー: {result['ingest_keys_deleted']} 行を削除しました")
+    print(f"合計 {result['rows_reclaimed']} 行を削減しました ({result['seconds']}秒)")
+
+def reconcile_counters(args):
+    """
+    ユーザーの累計カウンタを元データから数え直し、ずれていれば修正します。
+    """
+    from app import counters
+    checked, drifted = counters.reconcile(chunk_size=args.chunk_size, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{checked} 人中 {drifted} 人の累計カウンタがずれています。")
+    else:
+        print(f"{checked} 人中 {drifted} 人の累計カウンタを修正しました。")
+
+def export_history(args):
+    """
+    セッションやアクティビティの履歴を CSV / NDJSON でファイル (省略時は標準出力) に書き出します。
+    """
+    from app import export
+    user_id = None
+    if args.username:
+        user_id = db.session.query(User.id).filter(User.username == args.username).scalar()
+        if user_id is None:
+            print(f"エラー: ユーザー '{args.username}' は見つかりませんでした。")
+            return
+    elif args.user_id is not None:
+        user_id = args.user_id
+
+    body = export.stream(args.kind, args.format, user_id=user_id, start=args.start, end=args.end)
+    if not args.output:
+        for chunk in body:
+            sys.stdout.write(chunk)
+        return
+    with open(args.output, 'w', encoding='utf-8', newline='') as f:
+        for chunk in body:
+            f.write(chunk)
+    print(f"{args.kind} を {args.output} に書き出しました。")
+
+def _add_id_range(parser):
+    parser.add_argument('--min-id', type=int, help='対象とする ID の下限 (この値を含む)')
+    parser.add_argument('--max-id', type=int, help='対象とする ID の上限 (この値を含む)')
+
+def _add_delete_options(parser):
+    parser.add_argument('--chunk-size', type=int, default=bulk.DEFAULT_CHUNK_SIZE,
+                        help='1トランザクションで削除する件数')
+    parser.add_argument('--dry-run', action='store_true', help='削除せずに対象件数だけ表示する')
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='FocusFlow の管理コマンドです。')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    users = commands.add_parser('list-users', help='ユーザーを一覧表示します。')
+    _add_id_range(users)
+    users.add_argument('--inactive-since', type=_parse_date, help='この日 (YYYY-MM-DD) より前に登録し、以降に活動のないユーザーだけ表示する')
+    users.set_defaults(handler=list_users)
+
+    rooms = commands.add_parser('list-rooms', help='フォーカスルームを一覧表示します。')
+    _add_id_range(rooms)
+    rooms.set_defaults(handler=list_rooms)
+
+    del_users = commands.add_parser('delete-users', help='ユーザーを関連データごと一括削除します。')
+    del_users.add_argument('--id', type=int, action='append', help='削除するユーザーのID (複数指定可)')
+    del_users.add_argument('--email', type=str, help='削除するユーザーのメールアドレス')
+    del_users.add_argument('--username', type=str, help='削除するユーザーのユーザー名')
+    del_users.add_argument('--inactive-since', type=_parse_date, help='この日 (YYYY-MM-DD) より前に登録し、以降に活動のないユーザーを削除する')
+    _add_id_range(del_users)
+    _add_delete_options(del_users)
+    del_users.set_defaults(handler=delete_users)
+
+    del_rooms = commands.add_parser('delete-rooms', help='フォーカスルームをチャット・参加者ごと一括削除します。')
+    del_rooms.add_argument('--id', type=int, action='append', help='削除するルームのID (複数指定可)')
+    del_rooms.add_argument('--name', type=str, help='削除するルームの名前')
+    _add_id_range(del_rooms)
+    _add_delete_options(del_rooms)
+    del_rooms.set_defaults(handler=delete_rooms)
+    comp = commands.add_parser('compact', help='古いアクティビティを集約し、チャット履歴を削減します。')
+    comp.add_argument('--activity-days', type=int, help='この日数より古いアクティビティを日別集計にまとめる')
+    comp.add_argument('--chat-per-room', type=int, help='ルームごとに残すチャット件数 (0 で削減しない)')
+    comp.add_argument('--batch-size', type=int, help='1トランザクションで処理する行数')
+    comp.add_argument('--archive-dir', type=str, help='削除する行を NDJSON で書き出すディレクトリ')
+    comp.set_defaults(handler=compact)
+
+    recon = commands.add_parser('reconcile-counters', help='ユーザーの累計カウンタを数え直して修正します。')
+    recon.add_argument('--chunk-size', type=int, default=bulk.DEFAULT_CHUNK_SIZE, help='1トランザクションで更新する人数')
+    recon.add_argument('--dry-run', action='store_true', help='修正せずにずれている人数だけ表示する')
+    recon.set_defaults(handler=reconcile_counters)
+
+    exp = commands.add_parser('export', help='セッションやアクティビティの履歴を CSV / NDJSON で書き出します。')
+    exp.add_argument('kind', choices=['sessions', 'activity', 'activity_daily'], help='書き出す履歴の種類')
+    exp.add_argument('--format', choices=['csv', 'ndjson'], default='csv', help='出力形式')
+    exp.add_argument('--user-id', type=int, help='このユーザーの履歴だけ書き出す')
+    exp.add_argument('--username', type=str, help='このユーザー名のユーザーの履歴だけ書き出す')
+    exp.add_argument('--from', dest='start', type=lambda value: _parse_date(value).date(),
+                     help='この日 (YYYY-MM-DD) 以降の履歴だけ書き出す')
+    exp.add_argument('--to', dest='end', type=lambda value: _parse_date(value).date(),
+                     help='この日 (YYYY-MM-DD) までの履歴だけ書き出す')
+    exp.add_argument('--output', type=str, help='書き出すファイル (省略時は標準出力)')
+    exp.set_defaults(handler=export_history)
+    return parser
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    # 環境変数FLASK_APPを設定
+    os.environ['FLASK_APP'] = 'run.py'
+    app = create_app(web=False)
+    with app.app_context():
+        args.handler(args)
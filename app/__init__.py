@@ -2,33 +2,89 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_socketio import SocketIO
+from config import get_config
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 socketio = SocketIO()
 
-def create_app():
+def create_app(config_name=None, web=True, migrate=True):
+    """
+    アプリケーションを作成します。
+    管理コマンドなど web=False のときは、ルート・ソケットイベント・計測など
+    リクエスト処理にしか使わないモジュールを読み込みません。
+    migrate=False のときは未適用のマイグレーションを適用しません (migrate_db.py が自分で適用するため)。
+    """
     app = Flask(__name__)
-    # 時間できたらhttps化
-    app.config['SECRET_KEY'] = 'your_secret_key' # 後で変更
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.from_object(get_config(config_name))
 
+    from .database import engine_options, configure_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app)
     db.init_app(app)
+    with app.app_context():
+        configure_engine(app, db.engine)
     login_manager.init_app(app)
-    socketio.init_app(app)
+    if web:
+        from .metrics import metrics
+        metrics.init_app(app)
+        from .cache_stamp import cache_stamp
+        cache_stamp.init_app(app)
+        # ハンドラを socketio に登録してから init_app する (作成されるサーバーごとに登録される)
+        from . import events # events.py をインポート
+        from .socket_queue import socketio_options, cluster
+        socketio.init_app(app, **socketio_options(app))
+        cluster.start(socketio.server)
+
+    from .hashing import password_hasher
+    password_hasher.init_app(app)
+
+    from .presence import presence
+    presence.init_app(app)
+
+    from .chat import chat_buffer, chat_writer
+    chat_buffer.init_app(app)
+    chat_writer.init_app(app)
+
+    from .membership import membership
+    membership.init_app(app)
+
+    from .room_stats import room_stats
+    room_stats.init_app(app)
+
+    from .follow_graph import follow_graph
+    follow_graph.init_app(app)
+
+    from .response_cache import response_cache
+    response_cache.init_app(app)
+
+    from .report_cache import report_cache
+    report_cache.init_app(app)
 
     from .models import User
+    from .identity import identity_cache
+    identity_cache.init_app(app)
+    identity_cache.register_model_events(User)
+    if web:
+        # admin.py での一括削除などは cache_stamp の版数で伝わるので、削除された行を参照しうるキャッシュを捨てる
+        for cache in (identity_cache, membership, follow_graph, room_stats, chat_buffer,
+                      response_cache, report_cache):
+            cache_stamp.on_change(cache.clear)
+        metrics.expose('identity_cache', identity_cache.stats)
+        metrics.expose('response_cache', response_cache.stats)
+        metrics.expose('report_cache', report_cache.stats)
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
-
-    from .routes import main as main_blueprint
-    app.register_blueprint(main_blueprint)
+        return identity_cache.load(int(user_id))
 
-    from . import events # events.py をインポート
+    if web:
+        from .routes import main as main_blueprint
+        app.register_blueprint(main_blueprint)
 
-    with app.app_context():
-        db.create_all()
+    if migrate:
+        from . import migrations
+        with app.app_context():
+            # 記録されたスキーマバージョンが最新なら create_all は行わない
+            migrations.ensure_schema()
 
     return app
\ No newline at end of file
@@ -0,0 +1,75 @@
+from . import db
+from .cache_stamp import cache_stamp
+from .models import (User, FocusSession, ActivityLog, ActivityDaily, IngestKey, FocusRoom, ChatMessage, WeeklyFocus,
+                     followers, room_participants)
+
+DEFAULT_CHUNK_SIZE = 500
+
+def _chunks(ids, size):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def inactive_users(since):
+    """
+    since より前に登録し、since 以降にセッション・アクティビティ・チャットのいずれも記録していない
+    ユーザーの ID を選ぶ SELECT を返します。User.id.in_(...) に渡して副問い合わせとして使います
+    (ID のリストを展開すると SQLite のパラメータ数の上限を超えるため)。
+    登録日時のない (created_at の列を追加する前からいる) ユーザーは since より前の登録とみなします。
+    """
+    active = db.union(
+        db.select(FocusSession.user_id).where(FocusSession.timestamp >= since),
+        db.select(ActivityLog.user_id).where(ActivityLog.timestamp >= since),
+        db.select(ChatMessage.user_id).where(ChatMessage.timestamp >= since),
+    )
+    return db.select(User.id).where(
+        db.or_(User.created_at.is_(None), User.created_at < since),
+        User.id.not_in(active)
+    )
+
+def _delete_rooms_chunk(room_ids):
+    # ORM の cascade を使わず、子テーブルから順に一括 DELETE する
+    db.session.execute(db.delete(ChatMessage).where(ChatMessage.room_id.in_(room_ids)))
+    db.session.execute(room_participants.delete().where(room_participants.c.room_id.in_(room_ids)))
+    return db.session.execute(db.delete(FocusRoom).where(FocusRoom.id.in_(room_ids))).rowcount
+
+def delete_rooms(room_ids, chunk_size=DEFAULT_CHUNK_SIZE, on_chunk=None):
+    """
+    ルームとそのチャット・参加者を chunk_size 件ずつ別々のトランザクションで削除します。
+    削除したルーム数を返します。
+    """
+    deleted = 0
+    for chunk in _chunks(room_ids, chunk_size):
+        deleted += _delete_rooms_chunk(chunk)
+        cache_stamp.bump()
+        db.session.commit()
+        if on_chunk:
+            on_chunk(chunk)
+    return deleted
+
+def delete_users(user_ids, chunk_size=DEFAULT_CHUNK_SIZE, on_chunk=None):
+    """
+    ユーザーと関連データ (セッション、アクティビティとその日別集計、週間集計、チャット、フォロー関係、
+    参加情報、所有するルームとその中身) を chunk_size 人ずつ別々のトランザクションで削除します。
+    1回のトランザクションを短く保つことで、大量削除中も Web 側の書き込みを長く止めません。
+    削除したユーザーは、Web プロセスが CACHE_STAMP_INTERVAL 秒以内にキャッシュから外します。
+    (削除したユーザー数, 削除したルーム数) を返します。
+    """
+    deleted_users = 0
+    deleted_rooms = 0
+    for chunk in _chunks(user_ids, chunk_size):
+        owned_rooms = [row[0] for row in db.session.query(FocusRoom.id).filter(FocusRoom.owner_id.in_(chunk))]
+        if owned_rooms:
+            deleted_rooms += _delete_rooms_chunk(owned_rooms)
+        for model in (FocusSession, ActivityLog, ActivityDaily, IngestKey, WeeklyFocus, ChatMessage):
+            db.session.execute(db.delete(model).where(model.user_id.in_(chunk)))
+        db.session.execute(followers.delete().where(db.or_(
+            followers.c.follower_id.in_(chunk), followers.c.followed_id.in_(chunk))))
+        db.session.execute(room_participants.delete().where(room_participants.c.user_id.in_(chunk)))
+        deleted_users += db.session.execute(db.delete(User).where(User.id.in_(chunk))).rowcount
+        # 実行中の Web プロセスのキャッシュ (ログイン中のユーザーなど) を破棄させる
+        cache_stamp.bump()
+        db.session.commit()
+        if on_chunk:
+            on_chunk(chunk, owned_rooms)
+    return deleted_users, deleted_rooms
@@ -0,0 +1,60 @@
+import threading
+import time
+from . import db
+
+class CacheStamp:
+    """
+    admin.py など別プロセスでの一括変更を、DB に置いた版数を通じて Web プロセスのキャッシュに伝えます。
+    変更する側は bump() を同じトランザクションで実行し、Web 側はリクエストの前に interval 秒に1回だけ
+    版数を読んで、変わっていれば on_change で登録された関数を呼びます。
+    """
+    NAME = 'bulk'
+
+    def __init__(self, app=None):
+        self.interval = 2
+        self._version = None
+        self._checked_at = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get('CACHE_STAMP_INTERVAL', self.interval)
+        app.before_request(self.check)
+
+    def on_change(self, listener):
+        """
+        版数が変わったときに引数なしで呼ばれる関数を登録します。
+        """
+        # create_app が何度呼ばれても (テストなど) 二重に登録しない
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        return listener
+
+    def bump(self):
+        """
+        版数を1つ進めます。コミットは呼び出し側で行います。
+        """
+        from .models import CacheVersion
+        updated = db.session.execute(db.update(CacheVersion).where(CacheVersion.name == self.NAME).values(
+            version=CacheVersion.version + 1)).rowcount
+        if not updated:
+            db.session.add(CacheVersion(name=self.NAME, version=1))
+
+    def check(self):
+        from .models import CacheVersion
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.interval:
+                return
+            self._checked_at = now
+        version = db.session.query(CacheVersion.version).filter(CacheVersion.name == self.NAME).scalar() or 0
+        with self._lock:
+            previous, self._version = self._version, version
+        if previous is not None and version != previous:
+            for listener in self._listeners:
+                listener()
+
+
+cache_stamp = CacheStamp()
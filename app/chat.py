@@ -0,0 +1,376 @@
+import atexit
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime, timezone
+from . import db, socketio
+from sqlalchemy.exc import IntegrityError
+from .models import ChatMessage, FocusRoom, room_participants
+from .feed import keyset_page
+from .socket_queue import cluster
+
+# 保存待ちのメッセージは id が None
+BufferedMessage = namedtuple('BufferedMessage', 'id user_id username message timestamp')
+
+def _buffered(message):
+    # DB から読み込んだ ChatMessage をバッファ用に変換する
+    return BufferedMessage(message.id, message.user_id, message.user.username, message.message, message.timestamp)
+
+class ChatBuffer:
+    """
+    ルームごとの直近メッセージを保持するリングバッファ。
+    保持するルーム数には上限があり、最も使われていないルームから破棄します (LRU)。
+    他のワーカーで保存されたメッセージはメッセージキュー経由で追加され、
+    取りこぼしに備えて ttl 秒ごとに DB から読み直します。
+    """
+
+    def __init__(self, app=None):
+        self.size = 50
+        self.max_rooms = 200
+        self.ttl = 300
+        self._rooms = OrderedDict()  # room_id -> deque[BufferedMessage]
+        self._loaded_at = {}  # room_id -> DB から読み込んだ時刻
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.size = app.config.get('CHAT_BUFFER_SIZE', self.size)
+        self.max_rooms = app.config.get('CHAT_BUFFER_ROOMS', self.max_rooms)
+        self.ttl = app.config.get('CHAT_BUFFER_TTL', self.ttl)
+
+    def _fresh(self, room_id):
+        loaded_at = self._loaded_at.get(room_id)
+        return loaded_at is not None and time.monotonic() - loaded_at <= self.ttl
+
+    def recent(self, room_id):
+        """
+        ルームの直近メッセージを古い順に返します。未読み込みか ttl を過ぎていれば DB から読み込みます。
+        """
+        with self._lock:
+            messages = self._rooms.get(room_id)
+            if messages is not None and self._fresh(room_id):
+                self._rooms.move_to_end(room_id)
+                return list(messages)
+
+        # 先に保存待ちを読む (DB を読んでいる間に保存されたものは下で重複を除く)
+        pending = chat_writer.pending(room_id)
+        rows = ChatMessage.query.options(db.joinedload(ChatMessage.user)).filter(
+            ChatMessage.room_id == room_id
+        ).order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(self.size).all()
+        messages = deque((_buffered(row) for row in reversed(rows)), maxlen=self.size)
+        saved = {(m.user_id, m.message, m.timestamp) for m in messages}
+        messages.extend(m for m in pending if (m.user_id, m.message, m.timestamp) not in saved)
+
+        with self._lock:
+            # 読み込み中に他のリクエストが先に読み込んでいればそちらを使う
+            if room_id in self._rooms and self._fresh(room_id):
+                messages = self._rooms[room_id]
+            else:
+                self._rooms[room_id] = messages
+                self._loaded_at[room_id] = time.monotonic()
+            self._rooms.move_to_end(room_id)
+            while len(self._rooms) > self.max_rooms:
+                evicted, _ = self._rooms.popitem(last=False)
+                self._loaded_at.pop(evicted, None)
+            return list(messages)
+
+    def append(self, room_id, message):
+        """
+        メッセージ (BufferedMessage) を追加します。読み込み前のルームと、既に読み込まれている
+        (DB から読み直したときに含まれていた) メッセージは何もしません。
+        """
+        with self._lock:
+            messages = self._rooms.get(room_id)
+            if messages is None:
+                return
+            if message.id is not None and any(current.id == message.id for current in messages):
+                return
+            messages.append(message)
+
+    def replace(self, room_id, pending, message):
+        """
+        保存待ちとして追加したメッセージを保存済みのもの (id 付き) に差し替えます。
+        message が None なら取り除きます (保存できなかった場合)。
+        """
+        with self._lock:
+            messages = self._rooms.get(room_id)
+            if messages is None:
+                return
+            for index, current in enumerate(messages):
+                if current is pending:
+                    if message is None:
+                        del messages[index]
+                    else:
+                        messages[index] = message
+                    return
+
+    def evict(self, room_id):
+        """
+        ルームのバッファを破棄します (ルームの削除時など)。他のワーカーにも伝えます。
+        """
+        self._evict(room_id)
+        cluster.publish('chat_evict', room_id=room_id)
+
+    def _evict(self, room_id):
+        with self._lock:
+            self._rooms.pop(room_id, None)
+            self._loaded_at.pop(room_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+            self._loaded_at.clear()
+
+
+def history_page(room_id, cursor, limit=None):
+    """
+    カーソルより古いメッセージを新しい順に1ページ分返します。
+    現在の参加者のメッセージのみを対象にします。
+    """
+    participant_ids = db.session.query(room_participants.c.user_id).filter(
+        room_participants.c.room_id == room_id).scalar_subquery()
+    query = ChatMessage.query.options(db.joinedload(ChatMessage.user)).filter(
+        ChatMessage.room_id == room_id,
+        ChatMessage.user_id.in_(participant_ids)
+    )
+    return keyset_page(query, ChatMessage, cursor, limit or chat_buffer.size)
+
+
+class ChatWriter:
+    """
+    チャットメッセージを送信後にまとめて保存する書き込みキュー。
+    件数 (CHAT_FLUSH_BATCH) か経過時間 (CHAT_FLUSH_INTERVAL) のどちらかで
+    バックグラウンドタスクが1トランザクションにまとめてコミットします。
+    バッチが制約違反で失敗した場合は1件ずつ保存し直し、それでも保存できないメッセージ
+    (削除されたルームやユーザーのもの) は警告ログに残して破棄します。
+    プロセスの終了時 (通常の終了と SIGTERM) には保存待ちのメッセージを書き出してから終わります。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 50
+        self.flush_interval = 1.0
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._started = False
+        self.stats = {
+            'enqueued': 0,
+            'persisted': 0,
+            'flushes': 0,
+            'failures': 0,
+            'dropped': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('CHAT_FLUSH_BATCH', self.batch_size)
+        self.flush_interval = app.config.get('CHAT_FLUSH_INTERVAL', self.flush_interval)
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    def enqueue(self, room_id, user_id, username, message):
+        """
+        メッセージを保存待ちにします。送信時刻はここで確定させます。
+        """
+        # server_default の CURRENT_TIMESTAMP と同じく UTC で記録する
+        timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
+        buffered = BufferedMessage(None, user_id, username, message, timestamp)
+        with self._lock:
+            self._pending.append((room_id, buffered))
+            self.stats['enqueued'] += 1
+        # 保存を待たずにバッファへ入れ、直後に再読み込みしても表示されるようにする
+        chat_buffer.append(room_id, buffered)
+        self._ensure_started()
+
+    def pending(self, room_id):
+        """
+        ルームの保存待ちメッセージ (BufferedMessage) を古い順に返します。
+        """
+        with self._lock:
+            return [message for pending_room, message in self._pending if pending_room == room_id]
+
+    def flush(self):
+        """
+        保存待ちのメッセージを最大 batch_size 件ずつコミットし、保存した件数を返します。
+        アプリケーションコンテキストの中で呼び出してください。
+        """
+        persisted = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return persisted
+
+                started = time.perf_counter()
+                # 既に削除されたルームのメッセージは保存しない (SQLite では外部キーで弾かれず孤立する)
+                existing = {row[0] for row in db.session.query(FocusRoom.id).filter(
+                    FocusRoom.id.in_({room_id for room_id, _ in batch}))}
+                self._drop([item for item in batch if item[0] not in existing], 'ルームが削除されています')
+                batch = [item for item in batch if item[0] in existing]
+
+                try:
+                    saved = self._save(batch)
+                except IntegrityError:
+                    db.session.rollback()
+                    with self._lock:
+                        self.stats['failures'] += 1
+                    saved = self._save_each(batch)
+                except Exception:
+                    db.session.rollback()
+                    # 接続エラーなど一時的な失敗は、順番を保ったまま先頭に戻して次回やり直す
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                        self.stats['failures'] += 1
+                    raise
+
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with self._lock:
+                    self.stats['persisted'] += len(saved)
+                    self.stats['flushes'] += 1
+                    self.stats['last_flush_ms'] = elapsed_ms
+                    self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+                    self.stats['total_flush_ms'] += elapsed_ms
+                for room_id, pending, message in saved:
+                    chat_buffer.replace(room_id, pending, message)
+                if saved:
+                    # 他のワーカーのバッファにも保存済みのメッセージを追加する
+                    cluster.publish('chat_messages', messages=[
+                        [room_id, message.id, message.user_id, message.username, message.message,
+                         message.timestamp.isoformat()]
+                        for room_id, _, message in saved
+                    ])
+                persisted += len(saved)
+
+    def _save(self, batch):
+        # batch を1トランザクションで保存し、(room_id, 保存待ち, 保存済み) のリストを返す
+        rows = [
+            ChatMessage(room_id=room_id, user_id=pending.user_id, message=pending.message, timestamp=pending.timestamp)
+            for room_id, pending in batch
+        ]
+        db.session.add_all(rows)
+        db.session.flush()
+        saved = [
+            (room_id, pending, pending._replace(id=row.id))
+            for row, (room_id, pending) in zip(rows, batch)
+        ]
+        db.session.commit()
+        return saved
+
+    def _save_each(self, batch):
+        # どの行が制約に違反したか分からないので1件ずつ保存し、失敗したものだけ破棄する
+        saved = []
+        for index, item in enumerate(batch):
+            try:
+                saved.extend(self._save([item]))
+            except IntegrityError:
+                db.session.rollback()
+                self._drop([item], '保存できません')
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self._pending.extendleft(reversed(batch[index:]))
+                raise
+        return saved
+
+    def _drop(self, items, reason):
+        if not items:
+            return
+        with self._lock:
+            self.stats['dropped'] += len(items)
+        for room_id, pending in items:
+            chat_buffer.replace(room_id, pending, None)
+            if self.app is not None:
+                self.app.logger.warning('チャットメッセージを破棄しました (%s): room=%s user=%s',
+                                        reason, room_id, pending.user_id)
+
+    def drain(self):
+        """
+        終了時に保存待ちのメッセージをすべて書き出します。
+        """
+        if self.app is None or not self._pending:
+            return 0
+        with self.app.app_context():
+            try:
+                return self.flush()
+            finally:
+                db.session.remove()
+
+    def _ensure_started(self):
+        if self._started or self.app is None:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        atexit.register(self.drain)
+        self._handle_sigterm()
+        socketio.start_background_task(self._run)
+
+    def _handle_sigterm(self):
+        # serve.py stop などの SIGTERM では atexit が呼ばれないので、書き出してから元の処理で終了する
+        try:
+            previous = signal.getsignal(signal.SIGTERM)
+            signal.signal(signal.SIGTERM, lambda signum, frame: socketio.start_background_task(
+                self._shutdown, previous, signum, frame))
+        except ValueError:
+            # メインスレッド以外 (threading モードのハンドラなど) からはシグナルを設定できない
+            pass
+
+    def _shutdown(self, previous, signum, frame):
+        # シグナルハンドラの中で書き出すと、割り込まれた flush とロックを取り合うので別のタスクで行う
+        # (eventlet では書き出しループの tick ごとにハブが起きるので、遅くとも flush_interval / 10 秒で始まる)
+        try:
+            self.drain()
+        except Exception:
+            self.app.logger.exception('chat drain on SIGTERM failed')
+        if callable(previous):
+            # gunicorn のワーカーなど、元のハンドラがあればそれに終了を任せる
+            previous(signum, frame)
+        else:
+            signal.signal(signum, previous if previous is not None else signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    def _run(self):
+        # 件数がたまればすぐ、そうでなければ flush_interval ごとに書き出す
+        tick = self.flush_interval / 10
+        last_flush = time.monotonic()
+        while True:
+            socketio.sleep(tick)
+            if self.depth < self.batch_size and time.monotonic() - last_flush < self.flush_interval:
+                continue
+            last_flush = time.monotonic()
+            if not self._pending:
+                continue
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    self.app.logger.exception('chat flush failed')
+                finally:
+                    db.session.remove()
+
+
+chat_buffer = ChatBuffer()
+chat_writer = ChatWriter()
+
+@cluster.on('chat_messages')
+def _remote_messages(messages):
+    for room_id, message_id, user_id, username, message, timestamp in messages:
+        chat_buffer.append(room_id, BufferedMessage(message_id, user_id, username, message,
+                                                    datetime.fromisoformat(timestamp)))
+
+@cluster.on('chat_evict')
+def _remote_evict(room_id):
+    chat_buffer._evict(room_id)
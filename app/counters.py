@@ -0,0 +1,68 @@
+from . import db
+from .models import User, FocusSession, ActivityLog, ActivityDaily
+
+def add_session(user_id, minutes, timestamp=None):
+    """
+    User の累計カウンタにセッションを1件加算します。記録と同じトランザクションで呼び、コミットは呼び出し側で行います。
+    """
+    # 省略時は FocusSession.timestamp の server_default と同じ現在時刻を使う (reconcile で差が出ないように)
+    timestamp = timestamp if timestamp is not None else db.func.now()
+    # オフライン中のセッションが後から届くこともあるので、最終セッション時刻は新しい方を残す
+    last_session_at = db.case(
+        (User.last_session_at.is_(None), timestamp),
+        (User.last_session_at < timestamp, timestamp),
+        else_=User.last_session_at
+    )
+    db.session.execute(db.update(User).where(User.id == user_id).values(
+        total_focus_minutes=User.total_focus_minutes + minutes,
+        session_count=User.session_count + 1,
+        last_session_at=last_session_at
+    ).execution_options(synchronize_session=False))
+
+def add_flow_state(user_id):
+    """
+    User の累計フロー状態回数を1加算します。コミットは呼び出し側で行います。
+    """
+    db.session.execute(db.update(User).where(User.id == user_id).values(
+        flow_state_count=User.flow_state_count + 1
+    ).execution_options(synchronize_session=False))
+
+def _expected_counters():
+    # User.id に相関したサブクエリで、元データから数え直した値を返す
+    minutes = db.select(db.func.coalesce(db.func.sum(FocusSession.duration_minutes), 0)).where(
+        FocusSession.user_id == User.id).scalar_subquery()
+    count = db.select(db.func.count(FocusSession.id)).where(FocusSession.user_id == User.id).scalar_subquery()
+    last = db.select(db.func.max(FocusSession.timestamp)).where(FocusSession.user_id == User.id).scalar_subquery()
+    flows = db.select(db.func.count(ActivityLog.id)).where(
+        ActivityLog.user_id == User.id, ActivityLog.activity_type == 'flow_state').scalar_subquery()
+    compacted_flows = db.select(db.func.coalesce(db.func.sum(ActivityDaily.count), 0)).where(
+        ActivityDaily.user_id == User.id, ActivityDaily.activity_type == 'flow_state').scalar_subquery()
+    return {
+        'total_focus_minutes': minutes,
+        'session_count': count,
+        'flow_state_count': flows + compacted_flows,
+        'last_session_at': last,
+    }
+
+def reconcile(chunk_size=500, dry_run=False):
+    """
+    FocusSession・ActivityLog・ActivityDaily から累計カウンタを数え直し、ずれているユーザーを直します。
+    chunk_size 人ずつ、数え直しと書き込みを1つの UPDATE 文 (SET 列 = (SELECT ...)) で行うので、
+    実行中に記録されたセッションの加算を古い集計値で上書きすることはありません。
+    (確認したユーザー数, ずれていたユーザー数) を返します。
+    """
+    expected = _expected_counters()
+    drifted = db.or_(*[getattr(User, column).is_distinct_from(value) for column, value in expected.items()])
+    user_ids = [row[0] for row in db.session.query(User.id).order_by(User.id)]
+
+    fixed = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        in_chunk = db.and_(User.id >= chunk[0], User.id <= chunk[-1])
+        if dry_run:
+            fixed += db.session.query(db.func.count(User.id)).filter(in_chunk, drifted).scalar()
+            continue
+        fixed += db.session.execute(db.update(User).where(in_chunk, drifted).values(
+            **expected).execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+    return len(user_ids), fixed
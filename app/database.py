@@ -0,0 +1,41 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+def engine_options(app):
+    """
+    接続先に応じた SQLALCHEMY_ENGINE_OPTIONS を組み立てます。
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        # busy_timeout は PRAGMA でも設定するが、接続時点の待ち時間も揃えておく
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+    else:
+        options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_pre_ping', True)
+    return options
+
+def configure_engine(app, engine):
+    """
+    SQLite の場合、接続ごとに WAL などの PRAGMA を設定するフックを登録します。
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = [
+        f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -1,21 +1,69 @@
 from flask_login import current_user
 from flask_socketio import join_room, leave_room, emit
-from . import socketio, db
-from .models import FocusRoom, ChatMessage
+from . import socketio
+from .models import User
+from .presence import presence
+from .chat import chat_writer
+from .membership import membership
+from .metrics import metrics
+
+def user_status_channel(user_id):
+    return f'user_status:{user_id}'
+
+@presence.on_change
+def push_user_status(user_id, status, gauge_level):
+    # プロフィールを見ているクライアントに変更があったときだけ送る
+    socketio.emit('user_status', {
+        'status': status,
+        'gauge_level': gauge_level
+    }, to=user_status_channel(user_id))
+
+@socketio.on('connect')
+def on_connect(auth=None):
+    # ログインしていないソケットは受け付けない (ページと同じくステータスやチャットは見せない)
+    if not current_user.is_authenticated:
+        return False
+
+@socketio.on('watch_user')
+@metrics.track_socket
+def on_watch_user(data):
+    if not current_user.is_authenticated:
+        return
+
+    user = User.query.filter_by(username=data.get('username')).first()
+    if user is None:
+        return
+
+    join_room(user_status_channel(user.id))
+    status, gauge_level = presence.get(user)
+    emit('user_status', {'status': status, 'gauge_level': gauge_level})
+
+@socketio.on('unwatch_user')
+@metrics.track_socket
+def on_unwatch_user(data):
+    if not current_user.is_authenticated:
+        return
+
+    user = User.query.filter_by(username=data.get('username')).first()
+    if user is None:
+        return
+
+    leave_room(user_status_channel(user.id))
 
 @socketio.on('join')
+@metrics.track_socket
 def on_join(data):
     room_id = data['room_id']
-    room = FocusRoom.query.get(room_id)
     username = current_user.username
     
-    if room is None or current_user not in room.participants:
+    if not membership.is_member(room_id, current_user.id):
         return
 
     join_room(room_id)
     emit('room_message', {'msg': f'{username} has entered the room.'}, to=room_id)
 
 @socketio.on('leave')
+@metrics.track_socket
 def on_leave(data):
     room_id = data['room_id']
     username = current_user.username
@@ -24,39 +72,39 @@ def on_leave(data):
     emit('room_message', {'msg': f'{username} has left the room.'}, to=room_id)
 
 @socketio.on('update_status')
+@metrics.track_socket
 def on_update_status(data):
     room_id = data['room_id']
-    room = FocusRoom.query.get(room_id)
     
-    if room is None or current_user not in room.participants:
+    if not membership.is_member(room_id, current_user.id):
         return
 
-    current_user.status = data.get('status', current_user.status)
-    current_user.current_gauge_level = int(data.get('gauge_level', 0))
-    db.session.commit()
+    status, _ = presence.get(current_user)
+    status = data.get('status', status)
+    gauge_level = int(data.get('gauge_level', 0))
+    presence.update(current_user.id, status, gauge_level)
 
     emit('status_updated', {
         'username': current_user.username,
-        'status': current_user.status,
-        'gauge_level': current_user.current_gauge_level
+        'status': status,
+        'gauge_level': gauge_level
     }, to=room_id, include_self=False)
 
 @socketio.on('room_chat')
+@metrics.track_socket
 def on_room_chat(data):
     room_id = data.get('room_id')
     msg = data.get('msg', '').strip()
-    room = FocusRoom.query.get(room_id)
     
     # 5文字以上、空白メッセージ、いないユーザーのメッセージは無視
     if not msg or len(msg) > 5:
         return
 
-    if room is None or current_user not in room.participants:
+    if not membership.is_member(room_id, current_user.id):
         return
 
-    new_message = ChatMessage(room_id=room_id, user_id=current_user.id, message=msg)
-    db.session.add(new_message)
-    db.session.commit()
+    # 先に配信し、保存は書き込みキューにまとめて任せる
+    chat_writer.enqueue(int(room_id), current_user.id, current_user.username, msg)
 
     emit('new_chat_message', {
         'username': current_user.username,
@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from . import db
+from .models import FocusSession, ActivityLog, ActivityDaily
+
+# データベースから1度に読み込む行数 (エクスポートのメモリ使用量はこの行数分で一定)
+YIELD_PER = 1000
+# レスポンスに1度に書き出すおおよそのバイト数
+CHUNK_SIZE = 64 * 1024
+
+# 種類ごとの (モデル, 書き出す列, 日付で絞り込む列)
+KINDS = {
+    'sessions': (FocusSession, ('id', 'user_id', 'task_name', 'duration_minutes', 'timestamp'), 'timestamp'),
+    'activity': (ActivityLog, ('id', 'user_id', 'activity_type', 'details', 'timestamp'), 'timestamp'),
+    # retention で日別集計にまとめられた古いアクティビティ
+    'activity_daily': (ActivityDaily, ('id', 'user_id', 'day', 'activity_type', 'count'), 'day'),
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+def parse_date(value):
+    """
+    YYYY-MM-DD 形式の日付を解釈します。空なら None、不正なら ValueError を送出します。
+    """
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def rows(kind, user_id=None, start=None, end=None):
+    """
+    kind の行を ID 順に YIELD_PER 件ずつ読み込んで1行ずつ返すジェネレータです。
+    start・end (date) を指定すると、その日から end の日まで (両端を含む) に絞り込みます。
+    """
+    model, columns, date_column = KINDS[kind]
+    date_column = getattr(model, date_column)
+    query = db.session.query(*[getattr(model, name) for name in columns])
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    # 日別集計は日付の列、それ以外は日時の列で絞り込む
+    is_date = date_column.type.python_type is not datetime
+    if start is not None:
+        query = query.filter(date_column >= (start if is_date else datetime.combine(start, datetime.min.time())))
+    if end is not None:
+        if is_date:
+            query = query.filter(date_column <= end)
+        else:
+            query = query.filter(date_column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+
+    for row in query.order_by(model.id).yield_per(YIELD_PER):
+        yield row
+
+def _isoformat(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def to_csv(kind, rows):
+    """
+    行をヘッダー付きの CSV に1行ずつ変換するジェネレータです。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(KINDS[kind][1])
+    yield flush()
+    for row in rows:
+        writer.writerow([_isoformat(value) for value in row])
+        yield flush()
+
+def to_ndjson(kind, rows):
+    """
+    行を1行1オブジェクトの JSON (NDJSON) に変換するジェネレータです。
+    """
+    columns = KINDS[kind][1]
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_isoformat, row))), ensure_ascii=False) + '\n'
+
+def _chunks(lines):
+    # 1行ずつ書き出すと小さな書き込みが大量になるので、CHUNK_SIZE 程度にまとめる
+    pending = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield ''.join(pending)
+
+def stream(kind, fmt, user_id=None, start=None, end=None):
+    """
+    エクスポートの本文を CHUNK_SIZE 程度ずつ返すジェネレータです。fmt は 'csv' か 'ndjson' です。
+    """
+    encode = to_csv if fmt == 'csv' else to_ndjson
+    return _chunks(encode(kind, rows(kind, user_id=user_id, start=start, end=end)))
@@ -0,0 +1,50 @@
+from datetime import datetime
+from . import db
+from .models import FocusSession, ActivityLog, followers
+
+PAGE_SIZE = 20
+
+def encode_cursor(row):
+    return f'{row.timestamp.isoformat()}_{row.id}'
+
+def decode_cursor(cursor):
+    """
+    "タイムスタンプ_ID" 形式のカーソルを分解します。不正な値は ValueError。
+    """
+    timestamp, row_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+def keyset_page(query, model, cursor, limit):
+    # (timestamp, id) の降順でカーソルより古い行を limit + 1 件取得し、次ページの有無を判定
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        # SQLite では保存済みの文字列表現と比較するため、カーソル行の値を副問い合わせで引く
+        cursor_row = db.aliased(model)
+        timestamp = db.func.coalesce(
+            db.session.query(cursor_row.timestamp).filter(cursor_row.id == row_id).scalar_subquery(),
+            timestamp
+        )
+        query = query.filter(db.or_(
+            model.timestamp < timestamp,
+            db.and_(model.timestamp == timestamp, model.id < row_id)
+        ))
+    rows = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def followed_activity_page(user_id, cursor=None, limit=PAGE_SIZE):
+    """
+    フォロー中ユーザーのアクティビティを1ページ分返します。
+    """
+    followed_ids = db.session.query(followers.c.followed_id).filter(
+        followers.c.follower_id == user_id).scalar_subquery()
+    query = ActivityLog.query.options(db.joinedload(ActivityLog.user)).filter(
+        ActivityLog.user_id.in_(followed_ids))
+    return keyset_page(query, ActivityLog, cursor, limit)
+
+def session_page(user_id, cursor=None, limit=PAGE_SIZE):
+    """
+    ユーザー自身のフォーカス履歴を1ページ分返します。
+    """
+    query = FocusSession.query.filter(FocusSession.user_id == user_id)
+    return keyset_page(query, FocusSession, cursor, limit)
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from . import db
+from .models import followers
+
+class FollowGraph:
+    """
+    ユーザーごとのフォロー中/フォロワーの ID 集合をキャッシュし、
+    is_following やフォロー数をメモリ上で答えます。User.follow/unfollow が add/remove で同期します。
+    他のプロセスでの変更に備え、エントリは ttl 秒で読み直します。
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self.max_users = 10000
+        self._followed = OrderedDict()   # user_id -> (set[user_id], loaded_at)
+        self._followers = OrderedDict()  # user_id -> (set[user_id], loaded_at)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('FOLLOW_GRAPH_TTL', self.ttl)
+        self.max_users = app.config.get('FOLLOW_GRAPH_USERS', self.max_users)
+
+    def _get(self, cache, user_id, key_column, value_column):
+        with self._lock:
+            entry = cache.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+                cache.move_to_end(user_id)
+                return entry[0]
+
+        ids = {row[0] for row in db.session.query(value_column).filter(key_column == user_id)}
+        with self._lock:
+            cache[user_id] = (ids, time.monotonic())
+            cache.move_to_end(user_id)
+            while len(cache) > self.max_users:
+                cache.popitem(last=False)
+        return ids
+
+    def followed(self, user_id):
+        return self._get(self._followed, user_id, followers.c.follower_id, followers.c.followed_id)
+
+    def followers(self, user_id):
+        return self._get(self._followers, user_id, followers.c.followed_id, followers.c.follower_id)
+
+    def is_following(self, user_id, other_id):
+        return other_id in self.followed(user_id)
+
+    def add(self, user_id, other_id):
+        with self._lock:
+            if user_id in self._followed:
+                self._followed[user_id][0].add(other_id)
+            if other_id in self._followers:
+                self._followers[other_id][0].add(user_id)
+
+    def remove(self, user_id, other_id):
+        with self._lock:
+            if user_id in self._followed:
+                self._followed[user_id][0].discard(other_id)
+            if other_id in self._followers:
+                self._followers[other_id][0].discard(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._followed.clear()
+            self._followers.clear()
+
+
+follow_graph = FollowGraph()
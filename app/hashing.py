@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from . import socketio
+
+class HashingBusy(Exception):
+    """
+    ハッシュ計算の待ちが上限に達したときに送出されます。
+    """
+
+
+class PasswordHasher:
+    """
+    パスワードのハッシュ計算 (PBKDF2/scrypt) をイベントループの外のスレッドで行います。
+    eventlet では tpool、それ以外では ThreadPoolExecutor を使い、同時に受け付ける件数が
+    queue_limit を超えたら HashingBusy で即座に断ります (バックプレッシャー)。
+    pool_size を 0 にするとその場で計算します。
+    """
+
+    def __init__(self, app=None):
+        self.pool_size = 2
+        self.queue_limit = 32
+        self._executor = None
+        self._green_slots = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.pool_size = app.config.get('HASH_POOL_SIZE', self.pool_size)
+        self.queue_limit = app.config.get('HASH_QUEUE_LIMIT', self.queue_limit)
+        self._executor = None
+        self._green_slots = None
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def _execute(self, func, *args):
+        if self.pool_size <= 0:
+            return func(*args)
+        # 管理コマンドなど Socket.IO を初期化しない場合は async_mode がない
+        if getattr(socketio, 'async_mode', None) == 'eventlet':
+            from eventlet import tpool
+            from eventlet.semaphore import Semaphore
+            # tpool 自体のスレッド数とは別に、同時に計算する件数を pool_size に抑える
+            if self._green_slots is None:
+                self._green_slots = Semaphore(self.pool_size)
+            with self._green_slots:
+                return tpool.execute(func, *args)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='password-hash')
+        return self._executor.submit(func, *args).result()
+
+    def _run(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.queue_limit:
+                raise HashingBusy()
+            self._in_flight += 1
+        try:
+            return self._execute(func, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def generate(self, password):
+        return self._run(generate_password_hash, password)
+
+    def check(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+
+password_hasher = PasswordHasher()
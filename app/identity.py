@@ -0,0 +1,75 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from . import db
+
+# スナップショットに含める列 (password_hash はログイン時だけ必要なので含めない)
+SNAPSHOT_COLUMNS = ('id', 'email', 'username', 'status', 'current_gauge_level', 'last_seen',
+                    'total_focus_minutes', 'session_count', 'flow_state_count', 'last_session_at')
+
+class IdentityCache:
+    """
+    Flask-Login の user_loader 用に、ユーザーの軽量なスナップショットを短時間キャッシュします。
+    キャッシュに当たった場合は SELECT を発行せずにセッションへ User を復元します。
+    User の更新・削除時は自動で破棄され、別プロセスでの変更も ttl 秒で反映されます。
+    admin.py での一括削除は cache_stamp の版数が変わったときに clear で全て破棄します。
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self._snapshots = {}  # user_id -> (dict, loaded_at)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', self.ttl)
+
+    def load(self, user_id):
+        from .models import User
+        mapper = db.inspect(User)
+        identity_key = mapper.identity_key_from_primary_key((user_id,))
+        # 同じセッションで既に読み込まれていればそれを使う
+        existing = db.session.identity_map.get(identity_key)
+        if existing is not None:
+            return existing
+
+        with self._lock:
+            entry = self._snapshots.get(user_id)
+            fresh = entry is not None and time.monotonic() - entry[1] <= self.ttl
+            self.stats['hits' if fresh else 'misses'] += 1
+
+        if not fresh:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                self.store(user)
+            return user
+
+        user = User(**entry[0])
+        make_transient_to_detached(user)
+        db.session.add(user)
+        return user
+
+    def store(self, user):
+        snapshot = {column: getattr(user, column) for column in SNAPSHOT_COLUMNS}
+        with self._lock:
+            self._snapshots[user.id] = (snapshot, time.monotonic())
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._snapshots.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def register_model_events(self, model):
+        @event.listens_for(model, 'after_update')
+        @event.listens_for(model, 'after_delete')
+        def invalidate_user(mapper, connection, target):
+            self.invalidate(target.id)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+from . import db, counters
+from .models import FocusSession, ActivityLog, WeeklyFocus, IngestKey, local_date
+
+# 1回のリクエストで受け付けるイベント数の上限
+MAX_BATCH_SIZE = 100
+MAX_KEY_LENGTH = 64
+# クライアントの時計のずれとして許容する範囲
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# オフライン中のイベントとして受け付ける古さの上限 (締めた週やレポートを後から書き換えさせない)
+# RETENTION_INGEST_KEY_DAYS より短くしておくと、キーが削除された後の再送は必ず古すぎるとして拒否される
+MAX_EVENT_AGE = timedelta(days=3)
+
+class IngestError(ValueError):
+    """
+    バッチの内容が不正なときに送出されます。index は問題のあったイベントの位置です。
+    """
+
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.index = index
+
+def record_session(user_id, task_name, duration_minutes, timestamp=None):
+    """
+    フォーカスセッションと週間集計・累計カウンタ・アクティビティログをセッションに追加します。コミットは呼び出し側で行います。
+    timestamp (UTC) を省略するとデータベースの現在時刻になります。
+    """
+    # timestamp を None のまま渡すと server_default ではなく NULL が入るので、指定時だけ渡す
+    extra = {'timestamp': timestamp} if timestamp else {}
+    session = FocusSession(task_name=task_name, duration_minutes=duration_minutes, user_id=user_id, **extra)
+    db.session.add(session)
+    day = local_date(timestamp) if timestamp else None
+    WeeklyFocus.add_minutes(user_id, duration_minutes, day=day)
+    counters.add_session(user_id, duration_minutes, timestamp)
+    db.session.add(ActivityLog(user_id=user_id, activity_type='session_end',
+                               details=f'{task_name}|{duration_minutes}', **extra))
+    return session
+
+def record_activity(user_id, activity_type, details=None, timestamp=None):
+    """
+    アクティビティログを追加し、フロー状態なら累計カウンタも加算します。コミットは呼び出し側で行います。
+    """
+    extra = {'timestamp': timestamp} if timestamp else {}
+    log = ActivityLog(user_id=user_id, activity_type=activity_type, details=details, **extra)
+    db.session.add(log)
+    if activity_type == 'flow_state':
+        counters.add_flow_state(user_id)
+    return log
+
+def _parse_timestamp(value, index):
+    # クライアントから送られるのは UNIX 時間 (ミリ秒)
+    # 時刻のないイベントは古さを確かめられず、冪等性キーの削除後に再送されると二重に数えられるので受け付けない
+    if value is None:
+        raise IngestError('occurred_at が指定されていません。', index)
+    try:
+        timestamp = datetime.fromtimestamp(float(value) / 1000, timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise IngestError('occurred_at が不正です。', index)
+    now = datetime.now(timezone.utc)
+    if timestamp > now + MAX_CLOCK_SKEW:
+        raise IngestError('occurred_at が未来の時刻です。', index)
+    if timestamp < now - MAX_EVENT_AGE:
+        raise IngestError('occurred_at が古すぎます。', index)
+    return min(timestamp, now).replace(tzinfo=None)
+
+def validate(events):
+    """
+    バッチを検証し、正規化したイベントのリストを返します。1件でも不正なら IngestError を送出します。
+    """
+    if not isinstance(events, list) or not events:
+        raise IngestError('events が指定されていません。')
+    if len(events) > MAX_BATCH_SIZE:
+        raise IngestError(f'一度に送信できるイベントは {MAX_BATCH_SIZE} 件までです。')
+
+    normalized = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            raise IngestError('イベントの形式が不正です。', index)
+        key = event.get('key')
+        if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+            raise IngestError('key が不正です。', index)
+        timestamp = _parse_timestamp(event.get('occurred_at'), index)
+
+        if event.get('type') == 'session':
+            task_name = event.get('task_name')
+            try:
+                duration_minutes = int(event.get('duration_minutes'))
+            except (TypeError, ValueError):
+                raise IngestError('duration_minutes が不正です。', index)
+            if not task_name or duration_minutes < 0:
+                raise IngestError('タスク名と時間が指定されていません。', index)
+            normalized.append({'key': key, 'type': 'session', 'task_name': str(task_name)[:200],
+                               'duration_minutes': duration_minutes, 'timestamp': timestamp})
+        elif event.get('type') == 'activity':
+            activity_type = event.get('activity_type')
+            if not activity_type:
+                raise IngestError('Activity type not provided', index)
+            details = event.get('details')
+            normalized.append({'key': key, 'type': 'activity', 'activity_type': str(activity_type)[:50],
+                               'details': str(details)[:200] if details is not None else None, 'timestamp': timestamp})
+        else:
+            raise IngestError('type は session か activity を指定してください。', index)
+    return normalized
+
+def apply(user_id, events):
+    """
+    検証済みのイベントを順番に1つのトランザクションで書き込みます。
+    既に受け付けたキー (再送) は読み飛ばすので、同じバッチを何度送っても二重に数えません。
+    (受け付けたイベント, 重複していたキー) を返します。
+    """
+    keys = [event['key'] for event in events]
+    seen = {row[0] for row in db.session.query(IngestKey.key).filter(
+        IngestKey.user_id == user_id, IngestKey.key.in_(keys))}
+
+    accepted = []
+    duplicates = []
+    for event in events:
+        if event['key'] in seen:
+            duplicates.append(event['key'])
+            continue
+        seen.add(event['key'])
+        db.session.add(IngestKey(user_id=user_id, key=event['key']))
+        if event['type'] == 'session':
+            # 0分のセッションは /log_session と同じく記録しない (キーだけ残して再送を防ぐ)
+            if event['duration_minutes'] > 0:
+                record_session(user_id, event['task_name'], event['duration_minutes'], event['timestamp'])
+        else:
+            record_activity(user_id, event['activity_type'], event['details'], event['timestamp'])
+        accepted.append(event)
+
+    # 同じキーが同時に送られた場合は一意制約で IntegrityError になり、全体がロールバックされる
+    db.session.commit()
+    return accepted, duplicates
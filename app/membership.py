@@ -0,0 +1,132 @@
+import threading
+import time
+from . import db
+from .models import room_participants
+from .socket_queue import cluster
+
+# 参加者でないという結果を覚えておく件数の上限 (超えたら期限切れのものを捨てる)
+MAX_NEGATIVE_ENTRIES = 10000
+
+class RoomMembership:
+    """
+    ルームごとの参加者 ID の集合をキャッシュし、ソケットイベントの権限確認を
+    クエリなしの集合検索で済ませます。参加・脱退・キック・作成・削除の際に更新します。
+    参加・脱退・キックとルームの削除は cluster で他のワーカーにも伝え、取りこぼしに備えてエントリは ttl 秒で読み直します。
+    参加者でない結果も negative_ttl 秒だけ覚え、参加していないユーザーのイベントごとに DB を読まないようにします。
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self.negative_ttl = 5
+        self._rooms = {}  # room_id -> (set[user_id], loaded_at)
+        self._misses = {}  # (room_id, user_id) -> 参加者でないと確かめた時刻
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('ROOM_MEMBERSHIP_TTL', self.ttl)
+        self.negative_ttl = app.config.get('ROOM_MEMBERSHIP_NEGATIVE_TTL', self.negative_ttl)
+
+    def _load(self, room_id):
+        members = {row[0] for row in db.session.query(room_participants.c.user_id).filter(
+            room_participants.c.room_id == room_id)}
+        with self._lock:
+            self._rooms[room_id] = (members, time.monotonic())
+        return members
+
+    def members(self, room_id):
+        with self._lock:
+            entry = self._rooms.get(room_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return self._load(room_id)
+        return entry[0]
+
+    def is_member(self, room_id, user_id):
+        """
+        参加者かどうかを返します。キャッシュにいない場合だけ DB で確かめ直します。
+        """
+        try:
+            room_id = int(room_id)
+        except (TypeError, ValueError):
+            return False
+        if user_id in self.members(room_id):
+            return True
+        key = (room_id, user_id)
+        with self._lock:
+            checked_at = self._misses.get(key)
+        if checked_at is not None and time.monotonic() - checked_at <= self.negative_ttl:
+            return False
+        # 別のプロセスで参加した直後の可能性があるので一度だけ読み直す
+        if user_id in self._load(room_id):
+            return True
+        self._remember_miss(key)
+        return False
+
+    def _remember_miss(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._misses) >= MAX_NEGATIVE_ENTRIES:
+                self._misses = {k: t for k, t in self._misses.items() if now - t <= self.negative_ttl}
+                if len(self._misses) >= MAX_NEGATIVE_ENTRIES:
+                    self._misses.clear()
+            self._misses[key] = now
+
+    def add(self, room_id, user_id):
+        """
+        参加を反映します。他のワーカーにも伝えます。コミットの後に呼んでください。
+        """
+        self._add(room_id, user_id)
+        cluster.publish('membership_add', room_id=room_id, user_id=user_id)
+
+    def _add(self, room_id, user_id):
+        with self._lock:
+            self._misses.pop((room_id, user_id), None)
+            entry = self._rooms.get(room_id)
+            if entry is not None:
+                entry[0].add(user_id)
+
+    def remove(self, room_id, user_id):
+        """
+        脱退・キックを反映します。他のワーカーにも伝え、そこで接続しているソケットからの発言も止めます。
+        """
+        self._remove(room_id, user_id)
+        cluster.publish('membership_remove', room_id=room_id, user_id=user_id)
+
+    def _remove(self, room_id, user_id):
+        with self._lock:
+            entry = self._rooms.get(room_id)
+            if entry is not None:
+                entry[0].discard(user_id)
+
+    def invalidate(self, room_id):
+        """
+        ルームのエントリを捨てて次回 DB から読み直させます (作成・削除の際)。他のワーカーにも伝えます。
+        """
+        self._invalidate(room_id)
+        cluster.publish('membership_invalidate', room_id=room_id)
+
+    def _invalidate(self, room_id):
+        with self._lock:
+            self._rooms.pop(room_id, None)
+            self._misses = {key: t for key, t in self._misses.items() if key[0] != room_id}
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+            self._misses.clear()
+
+
+membership = RoomMembership()
+
+@cluster.on('membership_add')
+def _remote_add(room_id, user_id):
+    membership._add(room_id, user_id)
+
+@cluster.on('membership_remove')
+def _remote_remove(room_id, user_id):
+    membership._remove(room_id, user_id)
+
+@cluster.on('membership_invalidate')
+def _remote_invalidate(room_id):
+    membership._invalidate(room_id)
@@ -0,0 +1,202 @@
+import functools
+import hmac
+import threading
+import time
+from flask import g, request, Response, abort, has_app_context
+from sqlalchemy import event
+from . import db
+
+# 処理時間 (秒) とクエリ数のヒストグラムの境界
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+class _EndpointStats:
+    def __init__(self):
+        self.duration = _Histogram(DURATION_BUCKETS)
+        self.queries = _Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.slow = 0
+
+class _Tracker:
+    """
+    1件のリクエスト (またはソケットイベント) の間に実行された SQL を記録します。
+    """
+    __slots__ = ('started', 'queries', 'db_seconds', 'slowest', 'slowest_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest = None
+        self.slowest_seconds = 0.0
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+class RequestMetrics:
+    """
+    リクエストとソケットイベントごとのクエリ数・DB 時間・処理時間・最も遅い SQL を記録し、
+    エンドポイントごとのヒストグラムを /metrics で Prometheus のテキスト形式で公開します。
+    閾値を超えたリクエストは警告ログに出します。
+    METRICS_ENABLED が偽のときはフックを登録しないので、ほとんどコストはかかりません。
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.slow_request_ms = 500
+        self.token = None
+        self._endpoints = {}  # エンドポイント名 -> _EndpointStats
+        self._exposed = {}  # 名前 -> キャッシュなどの stats (件数の dict)
+        self._lock = threading.Lock()
+        self._logger = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        self.slow_request_ms = app.config.get('METRICS_SLOW_REQUEST_MS', self.slow_request_ms)
+        self.token = app.config.get('METRICS_TOKEN')
+        self._logger = app.logger
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        # 送信元アドレスはリバースプロキシの後ろでは当てにならないので、トークンなしでは公開しない
+        if self.token:
+            app.add_url_rule('/metrics', 'metrics', self.view)
+        else:
+            app.logger.warning('METRICS_TOKEN が未設定なので /metrics は公開しません。')
+
+    def expose(self, name, stats):
+        """
+        キャッシュなどが持つ stats (キー -> 件数の dict) を /metrics に focusflow_<name>_<キー>_total として出します。
+        dict は参照を保持するので、登録後の更新もそのまま反映されます。
+        """
+        self._exposed[name] = stats
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        tracker = g.get('_metrics') if has_app_context() else None
+        if tracker is None:
+            return
+        tracker.queries += 1
+        tracker.db_seconds += elapsed
+        if elapsed >= tracker.slowest_seconds:
+            tracker.slowest_seconds = elapsed
+            tracker.slowest = statement
+
+    def _start_request(self):
+        g._metrics = _Tracker()
+
+    def _finish_request(self, exc=None):
+        tracker = g.pop('_metrics', None)
+        if tracker is not None:
+            self._record(request.endpoint or 'unknown', tracker)
+
+    def track_socket(self, handler):
+        """
+        ソケットイベントのハンドラを計測対象にするデコレータです (@socketio.on の内側に付けます)。
+        """
+        name = 'socket:' + handler.__name__.removeprefix('on_')
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return handler(*args, **kwargs)
+            g._metrics = _Tracker()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                self._record(name, g.pop('_metrics'))
+        return wrapper
+
+    def _record(self, endpoint, tracker):
+        elapsed = time.perf_counter() - tracker.started
+        slow = elapsed * 1000 >= self.slow_request_ms
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _EndpointStats()
+            stats.duration.observe(elapsed)
+            stats.queries.observe(tracker.queries)
+            stats.db_seconds += tracker.db_seconds
+            stats.slow += slow
+        if slow:
+            slowest = ' '.join((tracker.slowest or '').split())[:200]
+            self._logger.warning(
+                '遅いリクエスト: %s %.1fms (クエリ %d 件, DB %.1fms, 最も遅い SQL %.1fms: %s)',
+                endpoint, elapsed * 1000, tracker.queries, tracker.db_seconds * 1000,
+                tracker.slowest_seconds * 1000, slowest)
+
+    def render(self):
+        """
+        集計結果を Prometheus のテキスト形式で返します。
+        """
+        lines = []
+        def histogram(name, help_text, pick):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for endpoint, stats in sorted(self._endpoints.items()):
+                hist = pick(stats)
+                label = _label(endpoint)
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'{name}_bucket{{endpoint="{label}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{endpoint="{label}",le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{endpoint="{label}"}} {hist.sum}')
+                lines.append(f'{name}_count{{endpoint="{label}"}} {hist.count}')
+
+        def counter(name, help_text, pick):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for endpoint, stats in sorted(self._endpoints.items()):
+                lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {pick(stats)}')
+
+        with self._lock:
+            histogram('focusflow_request_duration_seconds', 'Handler time per request or socket event.', lambda s: s.duration)
+            histogram('focusflow_request_queries', 'SQL statements per request or socket event.', lambda s: s.queries)
+            counter('focusflow_request_db_seconds_total', 'Time spent in SQL statements.', lambda s: s.db_seconds)
+            counter('focusflow_slow_requests_total', 'Requests slower than METRICS_SLOW_REQUEST_MS.', lambda s: s.slow)
+        for name, stats in sorted(self._exposed.items()):
+            for key, value in sorted(stats.items()):
+                metric = f'focusflow_{name}_{key}_total'
+                lines.append(f'# HELP {metric} {name} {key.replace("_", " ")}.')
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def _authorized(self):
+        supplied = request.headers.get('Authorization', '')
+        return bool(self.token) and hmac.compare_digest(supplied, f'Bearer {self.token}')
+
+    def view(self):
+        if not self._authorized():
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+metrics = RequestMetrics()
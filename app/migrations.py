@@ -0,0 +1,92 @@
+from . import db
+
+# 適用済みのマイグレーション番号を記録するテーブル
+schema_version = db.Table('schema_version',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(200)),
+    db.Column('applied_at', db.DateTime, server_default=db.func.now())
+)
+
+# (番号, 説明, 実行するSQL) の順に並べる。一度リリースしたものは書き換えないこと
+# 新しいテーブル (モデル) を追加したときも番号を増やすこと (テーブル自体は create_all で作られる)
+MIGRATIONS = [
+    (1, 'ホットパス用のインデックスを追加', [
+        'CREATE INDEX IF NOT EXISTS ix_focus_session_user_timestamp ON focus_session (user_id, timestamp, id)',
+        'CREATE INDEX IF NOT EXISTS ix_activity_log_user_timestamp ON activity_log (user_id, timestamp, id)',
+        'CREATE INDEX IF NOT EXISTS ix_activity_log_user_type_timestamp ON activity_log (user_id, activity_type, timestamp)',
+        'CREATE INDEX IF NOT EXISTS ix_chat_message_room_timestamp ON chat_message (room_id, timestamp, id)',
+        'CREATE INDEX IF NOT EXISTS ix_followers_follower ON followers (follower_id, followed_id)',
+        'CREATE INDEX IF NOT EXISTS ix_followers_followed ON followers (followed_id, follower_id)',
+        'CREATE INDEX IF NOT EXISTS ix_room_participants_room ON room_participants (room_id, user_id)',
+        'CREATE INDEX IF NOT EXISTS ix_user_username ON "user" (username)',
+    ]),
+    (2, '日別アクティビティ集計テーブルを追加', []),
+    (3, 'バッチ送信の冪等性キーのテーブルを追加', []),
+    (4, 'ユーザーに累計カウンタを追加', [
+        'ALTER TABLE "user" ADD COLUMN total_focus_minutes INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE "user" ADD COLUMN session_count INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE "user" ADD COLUMN flow_state_count INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE "user" ADD COLUMN last_session_at TIMESTAMP',
+        # 既存のデータから初期値を埋める (以降のずれは admin.py reconcile-counters で直す)
+        'UPDATE "user" SET '
+        'total_focus_minutes = COALESCE((SELECT SUM(duration_minutes) FROM focus_session WHERE focus_session.user_id = "user".id), 0), '
+        'session_count = (SELECT COUNT(*) FROM focus_session WHERE focus_session.user_id = "user".id), '
+        'last_session_at = (SELECT MAX(timestamp) FROM focus_session WHERE focus_session.user_id = "user".id), '
+        "flow_state_count = (SELECT COUNT(*) FROM activity_log WHERE activity_log.user_id = \"user\".id AND activity_type = 'flow_state') "
+        "+ COALESCE((SELECT SUM(count) FROM activity_daily WHERE activity_daily.user_id = \"user\".id AND activity_type = 'flow_state'), 0)",
+    ]),
+    (5, 'ユーザーに最終ハートビート時刻を追加', [
+        'ALTER TABLE "user" ADD COLUMN last_seen TIMESTAMP',
+    ]),
+    (6, 'キャッシュの版数テーブルを追加', []),
+    (7, 'ユーザーに登録日時を追加', [
+        'ALTER TABLE "user" ADD COLUMN created_at TIMESTAMP',
+    ]),
+    (8, 'フォロー関係の重複を除いて一意にする', [
+        'CREATE TEMPORARY TABLE followers_dedup AS SELECT DISTINCT follower_id, followed_id FROM followers',
+        'DELETE FROM followers',
+        'INSERT INTO followers (follower_id, followed_id) SELECT follower_id, followed_id FROM followers_dedup',
+        'DROP TABLE followers_dedup',
+        'DROP INDEX IF EXISTS ix_followers_follower',
+        'CREATE UNIQUE INDEX ix_followers_follower ON followers (follower_id, followed_id)',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version():
+    try:
+        return db.session.query(db.func.max(schema_version.c.version)).scalar() or 0
+    except (db.exc.OperationalError, db.exc.ProgrammingError):
+        # schema_version テーブルがまだない (新しいデータベース)
+        db.session.rollback()
+        return 0
+
+def ensure_schema():
+    """
+    スキーマバージョンが最新でなければテーブルを作成し、未適用のマイグレーションを適用します。
+    最新の場合はバージョンを1回読むだけで終わります。適用した番号のリストを返します。
+    """
+    if current_version() >= LATEST_VERSION:
+        return []
+    # 新しいデータベースは create_all で最新のスキーマになるので、マイグレーションは記録だけ行う
+    is_new = not db.inspect(db.engine).has_table('user')
+    db.create_all()
+    return upgrade(record_only=is_new)
+
+def upgrade(record_only=False):
+    """
+    未適用のマイグレーションを番号順に適用し、適用した番号のリストを返します。
+    record_only が真なら SQL は実行せず、適用済みとして記録だけします。
+    """
+    version = current_version()
+    applied = []
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        for statement in [] if record_only else statements:
+            db.session.execute(db.text(statement))
+        db.session.execute(schema_version.insert().values(version=number, description=description))
+        db.session.commit()
+        applied.append(number)
+    return applied
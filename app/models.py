@@ -1,29 +1,59 @@
 from flask_login import UserMixin
 from . import db
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import date, timedelta, datetime
+from .hashing import password_hasher
+from datetime import date, timedelta, datetime, timezone
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+def week_start_of(day=None):
+    """
+    指定日(省略時は今日)が属する週の月曜日を返します。
+    """
+    day = day or date.today()
+    return day - timedelta(days=day.weekday())
+
+def local_date(timestamp):
+    """
+    DB に保存された UTC の日時を、週の集計に使うローカルの日付に変換します。
+    """
+    return timestamp.replace(tzinfo=timezone.utc).astimezone().date()
 
 # フォロー関係を定義するための中間テーブル
 followers = db.Table('followers',
     db.Column('follower_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('followed_id', db.Integer, db.ForeignKey('user.id'))
+    db.Column('followed_id', db.Integer, db.ForeignKey('user.id')),
+    # 同じフォローを二重に記録しない
+    db.Index('ix_followers_follower', 'follower_id', 'followed_id', unique=True),
+    db.Index('ix_followers_followed', 'followed_id', 'follower_id')
 )
 
 # ルーム参加者を定義するための中間テーブル
 room_participants = db.Table('room_participants',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('room_id', db.Integer, db.ForeignKey('focus_room.id'), primary_key=True)
+    db.Column('room_id', db.Integer, db.ForeignKey('focus_room.id'), primary_key=True),
+    db.Index('ix_room_participants_room', 'room_id', 'user_id')
 )
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    username = db.Column(db.String(100), nullable=False)
+    username = db.Column(db.String(100), nullable=False, index=True)
     password_hash = db.Column(db.String(128))
     sessions = db.relationship('FocusSession', backref='author', lazy=True)
     activity_logs = db.relationship('ActivityLog', backref='user', lazy=True)
     status = db.Column(db.String(50), default='オフライン')
     current_gauge_level = db.Column(db.Integer, default=0)
+    # 最後にステータスのハートビートを受けた時刻 (UTC)。古ければ status に関係なくオフライン扱い
+    last_seen = db.Column(db.DateTime, nullable=True)
+    # 登録日時 (UTC)。この列を追加する前からいたユーザーは NULL
+    created_at = db.Column(db.DateTime, nullable=True, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    # 累計の集計値 (セッション・フロー状態の記録と同じトランザクションで更新する。ずれたら admin.py reconcile-counters)
+    total_focus_minutes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    session_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    flow_state_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_session_at = db.Column(db.DateTime, nullable=True)
 
     # フォローしている/されている関係 (多対多)
     followed = db.relationship(
@@ -40,22 +70,36 @@ class User(UserMixin, db.Model):
                                    backref=db.backref('participants', lazy='dynamic'))
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.generate(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
 
     def follow(self, user):
-        if not self.is_following(user):
-            self.followed.append(user)
+        """
+        user をフォローします。キャッシュは他のワーカーでの変更を反映していないことがあるので、
+        DB に直接書き込み、既にフォロー済みなら一意制約で何もしません。コミットは呼び出し側で行います。
+        """
+        from .follow_graph import follow_graph
+        try:
+            with db.session.begin_nested():
+                db.session.execute(followers.insert().values(follower_id=self.id, followed_id=user.id))
+        except IntegrityError:
+            pass
+        follow_graph.add(self.id, user.id)
 
     def unfollow(self, user):
-        if self.is_following(user):
-            self.followed.remove(user)
+        """
+        user のフォローを解除します。キャッシュに関係なく DB から削除します。コミットは呼び出し側で行います。
+        """
+        from .follow_graph import follow_graph
+        db.session.execute(followers.delete().where(
+            followers.c.follower_id == self.id, followers.c.followed_id == user.id))
+        follow_graph.remove(self.id, user.id)
 
     def is_following(self, user):
-        return self.followed.filter(
-            followers.c.followed_id == user.id).count() > 0
+        from .follow_graph import follow_graph
+        return follow_graph.is_following(self.id, user.id)
 
     def followed_sessions(self):
         return FocusSession.query.join(
@@ -65,32 +109,125 @@ class User(UserMixin, db.Model):
 
     @property
     def total_focus_time(self):
-        return db.session.query(db.func.sum(FocusSession.duration_minutes)).filter(FocusSession.user_id == self.id).scalar() or 0
+        return self.total_focus_minutes or 0
 
     def weekly_focus_time(self):
-        today = date.today()
-        start_of_week = today - timedelta(days=today.weekday())
-        start_of_week_dt = datetime.combine(start_of_week, datetime.min.time())
-        return db.session.query(db.func.sum(FocusSession.duration_minutes)).filter(
-            FocusSession.user_id == self.id,
-            FocusSession.timestamp >= start_of_week_dt
+        return db.session.query(WeeklyFocus.minutes).filter(
+            WeeklyFocus.user_id == self.id,
+            WeeklyFocus.week_start == week_start_of()
         ).scalar() or 0
 
 
 class FocusSession(db.Model):
+    __table_args__ = (db.Index('ix_focus_session_user_timestamp', 'user_id', 'timestamp', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     task_name = db.Column(db.String(200), nullable=False)
     duration_minutes = db.Column(db.Integer, nullable=False)
     timestamp = db.Column(db.DateTime, server_default=db.func.now())
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+class WeeklyFocus(db.Model):
+    # ユーザーごとの週間集中時間の集計 (log_session で更新)
+    __tablename__ = 'weekly_focus'
+    __table_args__ = (db.UniqueConstraint('user_id', 'week_start'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def add_minutes(cls, user_id, minutes, day=None):
+        """
+        該当週の集計行に分数を加算します (行がなければ作ります)。コミットは呼び出し側で行います。
+        """
+        start = week_start_of(day)
+        table = cls.__table__
+        dialect = db.session.get_bind().dialect.name
+        # 同じ週の最初のセッションが同時に届いても一意制約違反にならないよう、1文の upsert で加算する
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            statement = insert(table).values(user_id=user_id, week_start=start, minutes=minutes)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.week_start],
+                set_={'minutes': table.c.minutes + statement.excluded.minutes}
+            ))
+            return
+
+        increment = db.update(table).where(table.c.user_id == user_id, table.c.week_start == start).values(
+            minutes=table.c.minutes + minutes)
+        if db.session.execute(increment).rowcount:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(table).values(user_id=user_id, week_start=start, minutes=minutes))
+        except IntegrityError:
+            # 他のリクエストが先に行を作った
+            db.session.execute(increment)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        既存の FocusSession から集計テーブルを作り直します。
+        """
+        totals = {}
+        rows = db.session.query(
+            FocusSession.user_id, FocusSession.timestamp, FocusSession.duration_minutes
+        ).execution_options(yield_per=1000)
+        for user_id, timestamp, minutes in rows:
+            # 記録時 (ingest.record_session) と同じくローカルの日付で週を決める
+            key = (user_id, week_start_of(local_date(timestamp)))
+            totals[key] = totals.get(key, 0) + minutes
+
+        cls.query.delete()
+        db.session.add_all(
+            cls(user_id=user_id, week_start=start, minutes=minutes)
+            for (user_id, start), minutes in totals.items()
+        )
+        db.session.commit()
+        return len(totals)
+
 class ActivityLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_activity_log_user_timestamp', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_activity_log_user_type_timestamp', 'user_id', 'activity_type', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     activity_type = db.Column(db.String(50), nullable=False)  #例: 'session_start', 'session_end', 'flow_state'
     details = db.Column(db.String(200), nullable=True) #例: タスク名や時間
     timestamp = db.Column(db.DateTime, server_default=db.func.now())
 
+class ActivityDaily(db.Model):
+    # 保持期間を過ぎた ActivityLog をユーザー・日・種類ごとに件数でまとめたもの (retention で作成)
+    __tablename__ = 'activity_daily'
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', 'activity_type'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    activity_type = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class IngestKey(db.Model):
+    # /api/ingest で受け付けたイベントのキー (再送されたイベントを二重に数えないため)
+    __tablename__ = 'ingest_key'
+    __table_args__ = (db.UniqueConstraint('user_id', 'key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+class CacheVersion(db.Model):
+    # admin.py など別プロセスでの一括変更を Web プロセスのキャッシュに伝えるための版数 (cache_stamp で使用)
+    __tablename__ = 'cache_version'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class FocusRoom(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -100,35 +237,33 @@ class FocusRoom(db.Model):
     password_hash = db.Column(db.String(128), nullable=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.generate(password)
 
     def check_password(self, password):
         if self.password_hash is None:
             return False
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
 
     @property
     def weekly_focus_time_avg(self):
-        today = date.today()
-        start_of_week = today - timedelta(days=today.weekday())
-        start_of_week_dt = datetime.combine(start_of_week, datetime.min.time())
-
-        participants = self.participants.all()
-        num_participants = len(participants)
+        num_participants, total_focus_time = db.session.query(
+            db.func.count(room_participants.c.user_id),
+            db.func.sum(WeeklyFocus.minutes)
+        ).select_from(room_participants).outerjoin(
+            WeeklyFocus, db.and_(
+                WeeklyFocus.user_id == room_participants.c.user_id,
+                WeeklyFocus.week_start == week_start_of()
+            )
+        ).filter(room_participants.c.room_id == self.id).one()
 
         if num_participants == 0:
             return 0
 
-        user_ids = [user.id for user in participants]
-
-        total_focus_time = db.session.query(db.func.sum(FocusSession.duration_minutes)).filter(
-            FocusSession.user_id.in_(user_ids),
-            FocusSession.timestamp >= start_of_week_dt
-        ).scalar() or 0
-        
-        return round(total_focus_time / num_participants, 1)
+        return round((total_focus_time or 0) / num_participants, 1)
 
 class ChatMessage(db.Model):
+    __table_args__ = (db.Index('ix_chat_message_room_timestamp', 'room_id', 'timestamp', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('focus_room.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -0,0 +1,185 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from . import db, socketio
+from .socket_queue import cluster
+
+OFFLINE = 'オフライン'
+
+class PresenceRegistry:
+    """
+    ユーザーのステータスとフォーカスゲージをプロセス内で保持し、
+    User テーブルへはまとめて書き戻します (write-behind)。
+    一定時間ハートビートがないユーザーはオフライン扱いになります。
+    他のワーカーで受けたハートビートはメッセージキュー経由で受け取り、書き戻しはそのワーカーに任せます。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.ttl = 30
+        self.flush_interval = 10
+        self._entries = {}  # user_id -> (status, gauge_level, updated_at, seen_at)
+        self._dirty = set()
+        self._remote = {}  # 他のワーカーが担当しているユーザー: user_id -> (status, gauge_level, received_at)
+        self._lock = threading.Lock()
+        self._started = False
+        self._listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get('PRESENCE_TTL_SECONDS', self.ttl)
+        self.flush_interval = app.config.get('PRESENCE_FLUSH_INTERVAL', self.flush_interval)
+
+    def on_change(self, listener):
+        """
+        ステータスかゲージが実際に変わったときに呼ばれる関数を登録するデコレーター。
+        listener(user_id, status, gauge_level) の形で呼ばれます。
+        """
+        self._listeners.append(listener)
+        return listener
+
+    def _notify(self, user_id, status, gauge_level):
+        for listener in self._listeners:
+            listener(user_id, status, gauge_level)
+
+    def update(self, user_id, status, gauge_level):
+        gauge_level = int(gauge_level)
+        with self._lock:
+            previous = self._entries.get(user_id)
+            self._entries[user_id] = (status, gauge_level, time.monotonic(), _utcnow())
+            self._dirty.add(user_id)
+            self._remote.pop(user_id, None)
+        self._ensure_started()
+        cluster.publish('presence', user_id=user_id, status=status, gauge_level=gauge_level)
+        if previous is None or previous[:2] != (status, gauge_level):
+            self._notify(user_id, status, gauge_level)
+
+    def get(self, user):
+        """
+        ユーザーの (status, gauge_level) を返します。
+        レジストリに無い場合は DB の値を使いますが、last_seen が古ければオフライン扱いにします
+        (再起動前に書き戻された「フォーカス中」がいつまでも残らないように)。
+        """
+        with self._lock:
+            entry = self._entries.get(user.id)
+            remote = self._remote.get(user.id)
+        if entry is None and remote is not None:
+            status, gauge_level, received_at = remote
+            if time.monotonic() - received_at > self.ttl:
+                return OFFLINE, 0
+            return status, gauge_level
+        if entry is None:
+            # 書き戻しは flush_interval ごとなので、その分だけ猶予を持たせる
+            limit = timedelta(seconds=self.ttl + self.flush_interval)
+            if user.last_seen is None or _utcnow() - user.last_seen > limit:
+                return OFFLINE, 0
+            return user.status, user.current_gauge_level
+        status, gauge_level, updated_at, _ = entry
+        if time.monotonic() - updated_at > self.ttl:
+            return OFFLINE, 0
+        return status, gauge_level
+
+    def snapshot(self, users):
+        """
+        複数ユーザーのステータスを {user_id: (status, gauge_level)} で返します。
+        """
+        return {user.id: self.get(user) for user in users}
+
+    def expire(self):
+        """
+        TTL を過ぎたユーザーをオフラインにして書き戻し対象にします。
+        """
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for user_id, (_, _, received_at) in list(self._remote.items()):
+                if now - received_at > self.ttl:
+                    self._remote.pop(user_id)
+            for user_id, (status, gauge_level, updated_at, seen_at) in list(self._entries.items()):
+                if now - updated_at <= self.ttl:
+                    continue
+                if status == OFFLINE and gauge_level == 0:
+                    self._entries.pop(user_id)
+                else:
+                    # 書き戻しが済むまでオフライン状態を残しておく
+                    self._entries[user_id] = (OFFLINE, 0, now, seen_at)
+                    self._dirty.add(user_id)
+                    expired.append(user_id)
+        for user_id in expired:
+            self._notify(user_id, OFFLINE, 0)
+
+    def flush(self):
+        """
+        変更のあったユーザーのステータスを1回の UPDATE でまとめて書き戻します。
+        コミットに失敗した場合は書き戻し対象に残し、次回やり直します。
+        """
+        from .models import User
+        with self._lock:
+            flushing = {user_id: self._entries[user_id] for user_id in self._dirty if user_id in self._entries}
+            self._dirty.intersection_update(flushing)
+        if not flushing:
+            return 0
+        rows = [
+            {'b_id': user_id, 'b_status': status, 'b_gauge_level': gauge_level, 'b_last_seen': seen_at}
+            for user_id, (status, gauge_level, _, seen_at) in flushing.items()
+        ]
+        # 削除済みユーザーが混ざっていても失敗しないよう Core の executemany を使う
+        users = User.__table__
+        statement = users.update().where(users.c.id == db.bindparam('b_id')).values(
+            status=db.bindparam('b_status'),
+            current_gauge_level=db.bindparam('b_gauge_level'),
+            last_seen=db.bindparam('b_last_seen')
+        )
+        db.session.execute(statement, rows)
+        db.session.commit()
+        with self._lock:
+            # 書き戻している間に更新されたユーザーは次回も書き戻す
+            for user_id, entry in flushing.items():
+                if self._entries.get(user_id) is entry:
+                    self._dirty.discard(user_id)
+        return len(rows)
+
+    def _ensure_started(self):
+        if self._started or self.app is None:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.flush_interval)
+            with self.app.app_context():
+                try:
+                    self.expire()
+                    self.flush()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('presence flush failed')
+                finally:
+                    db.session.remove()
+
+    def apply_remote(self, user_id, status, gauge_level):
+        """
+        他のワーカーで受けたハートビートを反映します。
+        このワーカーの古い状態は捨て、書き戻しやオフライン通知は相手のワーカーに任せます。
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._dirty.discard(user_id)
+            self._remote[user_id] = (status, gauge_level, time.monotonic())
+
+
+def _utcnow():
+    # last_seen は他の timestamp 列と同じく UTC (タイムゾーンなし) で保存する
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+presence = PresenceRegistry()
+
+@cluster.on('presence')
+def _remote_presence(user_id, status, gauge_level):
+    presence.apply_remote(user_id, status, gauge_level)
@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+class ReportCache:
+    """
+    レポートページの計算結果を (ユーザー, 日付) ごとにキャッシュします。
+    セッション記録やフロー状態の達成で invalidate し、日付が変わればキーが変わるので自動的に作り直されます。
+    フォロー中のユーザーの記録や他のプロセスでの変更に備え、ttl 秒でも作り直します。
+    保持するユーザー数は max_users までに抑え、古いものから捨てます (LRU)。
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 600
+        self.max_users = 5000
+        self._snapshots = OrderedDict()  # user_id -> (日付, スナップショット, 作成時刻)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('REPORT_CACHE_TTL', self.ttl)
+        self.max_users = app.config.get('REPORT_CACHE_USERS', self.max_users)
+
+    def get(self, user_id, build):
+        """
+        今日のスナップショットを返します。なければ build(user_id) で作って保存します。
+        """
+        today = date.today()
+        with self._lock:
+            entry = self._snapshots.get(user_id)
+            if entry is not None and entry[0] == today and time.monotonic() - entry[2] <= self.ttl:
+                self._snapshots.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+
+        snapshot = build(user_id)
+        with self._lock:
+            self._snapshots[user_id] = (today, snapshot, time.monotonic())
+            self._snapshots.move_to_end(user_id)
+            while len(self._snapshots) > self.max_users:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._snapshots.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+
+report_cache = ReportCache()
@@ -0,0 +1,179 @@
+from datetime import date, timedelta, datetime
+from sqlalchemy import func
+from . import db
+from collections import namedtuple
+from .models import User, FocusSession, ActivityLog, ActivityDaily
+from .follow_graph import follow_graph
+
+# スナップショットに入れる直近セッション (ORM オブジェクトはリクエストをまたいで使えないため)
+RecentSession = namedtuple('RecentSession', 'task_name duration_minutes timestamp')
+
+def _day_key(value):
+    # SQLite は文字列、PostgreSQL は date を返すので文字列に揃える
+    return str(value)[:10]
+
+def lifetime_totals(user_id):
+    """
+    累計の集中時間・セッション数・フロー状態回数を返します (User の累計カウンタを読むだけ)。
+    """
+    return db.session.query(
+        User.total_focus_minutes, User.session_count, User.flow_state_count
+    ).filter(User.id == user_id).one()
+
+def daily_series(user_id, days=7, today=None):
+    """
+    直近 days 日分のグラフ用データを日付ごとの GROUP BY でまとめて取得します。
+    データのない日は 0 で埋めます。
+    """
+    today = today or date.today()
+    dates = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+    start = datetime.combine(dates[0], datetime.min.time())
+
+    followed_ids = list(follow_graph.followed(user_id))
+    num_followed = len(followed_ids)
+
+    day = func.date(FocusSession.timestamp)
+    session_rows = db.session.query(
+        day,
+        func.sum(db.case((FocusSession.user_id == user_id, FocusSession.duration_minutes), else_=0)),
+        func.sum(db.case((FocusSession.user_id != user_id, FocusSession.duration_minutes), else_=0))
+    ).filter(
+        FocusSession.user_id.in_([user_id] + followed_ids),
+        FocusSession.timestamp >= start
+    ).group_by(day).all()
+    my_minutes = {_day_key(d): mine or 0 for d, mine, _ in session_rows}
+    followed_minutes = {_day_key(d): others or 0 for d, _, others in session_rows}
+
+    flow_day = func.date(ActivityLog.timestamp)
+    raw_flows = db.select(flow_day, func.count(ActivityLog.id)).where(
+        ActivityLog.user_id == user_id,
+        ActivityLog.activity_type == 'flow_state',
+        ActivityLog.timestamp >= start
+    ).group_by(flow_day)
+    compacted_flows = db.select(ActivityDaily.day, ActivityDaily.count).where(
+        ActivityDaily.user_id == user_id,
+        ActivityDaily.activity_type == 'flow_state',
+        ActivityDaily.day >= dates[0]
+    )
+    flow_counts = {}
+    for d, count in db.session.execute(db.union_all(raw_flows, compacted_flows)):
+        flow_counts[_day_key(d)] = flow_counts.get(_day_key(d), 0) + count
+
+    chart_labels = []
+    my_chart_data = []
+    flow_chart_data = []
+    followed_avg_data = []
+    for target_date in dates:
+        key = target_date.isoformat()
+        chart_labels.append(target_date.strftime('%m/%d'))
+        my_chart_data.append(my_minutes.get(key, 0))
+        flow_chart_data.append(flow_counts.get(key, 0))
+        if num_followed > 0:
+            followed_avg_data.append(round(followed_minutes.get(key, 0) / num_followed, 1))
+        else:
+            followed_avg_data.append(0)
+
+    return chart_labels, my_chart_data, flow_chart_data, followed_avg_data
+
+def status_message(total_sessions, total_flow_states, avg_session_length, my_chart_data, flow_chart_data):
+    """
+    直近7日間の集中データから、レポートに表示するステータス (絵文字, 説明文) を判定します。
+    """
+    weekly_total_focus = sum(my_chart_data)
+    days_with_focus = sum(1 for x in my_chart_data if x > 0)
+    weekly_flow_count = sum(flow_chart_data)
+    is_improving = sum(my_chart_data[4:]) > sum(my_chart_data[:3]) # 直近3日とそれ以前4日の比較
+    consecutive_days = 0
+    temp_days = 0
+    for minutes in reversed(my_chart_data):
+        if minutes > 0:
+            temp_days += 1
+        else:
+            break
+    consecutive_days = temp_days
+
+    status_emoji = '🧐'
+    status_text = 'あなたの集中データを分析中です...'
+
+    # 優先度順
+    if total_sessions > 0:
+        if total_sessions <= 5:
+            status_emoji = '✨'
+            status_text = 'ようこそ！FocusFlowへ。一緒に頑張りましょう！'
+        elif total_flow_states == 1 and weekly_flow_count == 1:
+            status_emoji = '💡'
+            status_text = '初めてのフロー状態！この感覚、忘れないでください。'
+        elif weekly_total_focus > 1500 and days_with_focus == 7 and weekly_flow_count > 5:
+            status_emoji = '👑'
+            status_text = '絶対王者。もはや集中力の化身です。'
+        elif weekly_total_focus > 1200 and days_with_focus >= 6 and weekly_flow_count > 10:
+            status_emoji = '🎓'
+            status_text = '探求者。深い学問の海に潜っていますね。'
+        elif weekly_total_focus > 1000 and days_with_focus >= 6:
+            status_emoji = '🔥'
+            status_text = '絶好調！素晴らしい集中力です！'
+        elif weekly_total_focus > 800 and days_with_focus >= 5:
+            status_emoji = '🚀'
+            status_text = '生産性の鬼。非常に高い集中を維持しています。'
+        elif days_with_focus == 7:
+            status_emoji = '🏃'
+            status_text = '継続の達人。長距離ランナーのように着実です。'
+        elif consecutive_days >= 3:
+            status_emoji = '📈'
+            status_text = f'{consecutive_days}日連続で集中中！波に乗っています。'
+        elif days_with_focus == 1 and weekly_total_focus > 300:
+            status_emoji = '💥'
+            status_text = '一極集中。たった一日で驚異的な成果です！'
+        elif days_with_focus <= 3 and weekly_total_focus > 400:
+            status_emoji = '⚡'
+            status_text = '短期集中型。週末などに一気に集中するタイプですね。'
+        elif weekly_flow_count > 5 and weekly_total_focus > 500:
+            status_emoji = '🧘'
+            status_text = 'フローの探求者。質の高い集中を重視していますね。'
+        elif weekly_total_focus > 400 and days_with_focus >= 4:
+            status_emoji = '👍'
+            status_text = '良いペースです。着実に学習が習慣化していますね。'
+        elif is_improving and weekly_total_focus > 120:
+            status_emoji = '🌱'
+            status_text = '成長中！週の後半にかけて調子が上がっています。'
+        elif days_with_focus > 0 and my_chart_data[-1] > 0 and weekly_total_focus < 120:
+            status_emoji = '💪'
+            status_text = '再始動！ここからの巻き返しに期待です。'
+        elif avg_session_length > 0 and avg_session_length < 15:
+            status_emoji = '☕'
+            status_text = 'スキマ時間の活用。小さな積み重ねが力になります。'
+        elif weekly_total_focus > 0:
+            status_emoji = '🙂'
+            status_text = '学習を継続できています。まずは続けることが大切です。'
+        elif weekly_total_focus == 0:
+            status_emoji = '😴'
+            status_text = '少し休憩中かな？まずは短い時間から始めてみましょう。'
+
+    return status_emoji, status_text
+
+def build_report(user_id):
+    """
+    レポートページに渡す値をまとめて計算します。
+    """
+    total_focus_time, total_sessions, total_flow_states = lifetime_totals(user_id)
+    avg_session_length = round(total_focus_time / total_sessions, 1) if total_sessions > 0 else 0
+
+    # 直近7日間のグラフ用データ (日付ごとにまとめて集計)
+    chart_labels, my_chart_data, flow_chart_data, followed_avg_data = daily_series(user_id)
+    status_emoji, status_text = status_message(
+        total_sessions, total_flow_states, avg_session_length, my_chart_data, flow_chart_data)
+
+    recent_sessions = [RecentSession(*row) for row in db.session.query(
+        FocusSession.task_name, FocusSession.duration_minutes, FocusSession.timestamp
+    ).filter(FocusSession.user_id == user_id).order_by(FocusSession.timestamp.desc()).limit(10)]
+
+    return dict(total_focus_time=total_focus_time,
+                total_sessions=total_sessions,
+                total_flow_states=total_flow_states,
+                chart_labels=chart_labels,
+                my_chart_data=my_chart_data,
+                flow_chart_data=flow_chart_data,
+                followed_avg_data=followed_avg_data,
+                recent_sessions=recent_sessions,
+                status_emoji=status_emoji,
+                status_text=status_text)
@@ -0,0 +1,121 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import request, session, make_response
+from flask_login import current_user
+
+class ResponseCache:
+    """
+    読み取り中心のページのレスポンス本文を、データのバージョン番号と一緒にキャッシュします。
+    書き込み側は関係するスコープ (例: 'sessions', 'rooms', 'user:<username>') を bump し、
+    ビューは cached(...) でスコープを宣言します。バージョンが変わっていなければ
+    クエリもテンプレート描画も行わずに本文を返し、If-None-Match が一致すれば 304 を返します。
+    本文の合計サイズは max_bytes までに抑え、古いものから捨てます (LRU)。
+    バージョン番号はプロセスごとなので、他のワーカーや管理コマンドでの変更は ttl 秒で反映されます。
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self.max_bytes = 8 * 1024 * 1024
+        self._versions = {}        # スコープ -> バージョン番号
+        self._entries = OrderedDict()  # キー -> (バージョン, ETag, 本文, mimetype, 保存時刻)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', self.ttl)
+        self.max_bytes = app.config.get('RESPONSE_CACHE_BYTES', self.max_bytes)
+
+    def bump(self, *scopes):
+        """
+        スコープのバージョンを上げ、そのスコープに依存するキャッシュを無効にします。コミットの後に呼んでください。
+        """
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _lookup(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != versions or time.monotonic() - entry[4] > self.ttl:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, entry):
+        if len(entry[2]) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._size += len(entry[2])
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[2])
+
+    def cached(self, *scopes, per_user=True):
+        """
+        ビューのレスポンスをキャッシュするデコレータです (@login_required の内側に付けます)。
+        scopes には文字列か、ビューの引数を受け取ってスコープ名を返す関数を渡します。
+        per_user が真ならログインユーザーごとに別々にキャッシュします。
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                # 未表示のフラッシュメッセージがあるときは、描画で消費させるためキャッシュを使わない
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+
+                resolved = [scope(**kwargs) if callable(scope) else scope for scope in scopes]
+                with self._lock:
+                    versions = tuple(self._versions.get(scope, 0) for scope in resolved)
+                key = (request.endpoint, tuple(sorted(kwargs.items())), request.query_string,
+                       current_user.get_id() if per_user else None)
+
+                entry = self._lookup(key, versions)
+                if entry is not None:
+                    _, etag, body, mimetype, _ = entry
+                    if etag in request.if_none_match:
+                        self.stats['not_modified'] += 1
+                    else:
+                        self.stats['hits'] += 1
+                    response = make_response(body)
+                    response.mimetype = mimetype
+                    return self._conditional(response, etag)
+
+                self.stats['misses'] += 1
+                response = make_response(view(**kwargs))
+                if response.status_code != 200 or response.is_streamed or session.modified:
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                self._store(key, (versions, etag, body, response.mimetype, time.monotonic()))
+                return self._conditional(response, etag)
+            return wrapper
+        return decorator
+
+    def _conditional(self, response, etag):
+        # ユーザーごとの内容なので共有キャッシュには置かせず、毎回 ETag で再検証させる
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from . import db
+from .models import ActivityLog, ActivityDaily, ChatMessage, IngestKey
+
+class _Archive:
+    """
+    削除する行を種類ごとの NDJSON ファイル (<種類>-<日付>.ndjson) に追記します。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, kind, rows):
+        if not self.directory or not rows:
+            return
+        path = os.path.join(self.directory, f"{kind}-{datetime.now().strftime('%Y%m%d')}.ndjson")
+        with open(path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+
+def _utcnow():
+    # timestamp 列は server_default の UTC (タイムゾーンなし) で保存されている
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def compact_activity(older_than_days, batch_size=1000, archive=None):
+    """
+    older_than_days 日より古い ActivityLog を ActivityDaily (ユーザー・日・種類ごとの件数) に加算し、
+    元の行を batch_size 件ずつ削除します。バッチごとにコミットするので途中で止めても整合性は保たれます。
+    (まとめた行数, 新しく作った集計行数) を返します。
+    """
+    cutoff = _utcnow() - timedelta(days=older_than_days)
+    compacted = 0
+    created = 0
+    while True:
+        rows = db.session.query(
+            ActivityLog.id, ActivityLog.user_id, ActivityLog.activity_type,
+            ActivityLog.details, ActivityLog.timestamp
+        ).filter(ActivityLog.timestamp < cutoff).order_by(ActivityLog.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        counts = {}
+        for _, user_id, activity_type, _, timestamp in rows:
+            key = (user_id, timestamp.date(), activity_type)
+            counts[key] = counts.get(key, 0) + 1
+
+        existing = {
+            (summary.user_id, summary.day, summary.activity_type): summary
+            for summary in ActivityDaily.query.filter(
+                ActivityDaily.user_id.in_({key[0] for key in counts}),
+                ActivityDaily.day.in_({key[1] for key in counts})
+            )
+        }
+        for key, count in counts.items():
+            summary = existing.get(key)
+            if summary is None:
+                user_id, day, activity_type = key
+                db.session.add(ActivityDaily(user_id=user_id, day=day, activity_type=activity_type, count=count))
+                created += 1
+            else:
+                summary.count += count
+
+        if archive:
+            archive.write('activity_log', [row._asdict() for row in rows])
+        db.session.execute(db.delete(ActivityLog).where(ActivityLog.id.in_([row.id for row in rows])))
+        db.session.commit()
+        compacted += len(rows)
+    return compacted, created
+
+def trim_chat(keep_per_room, batch_size=1000, archive=None):
+    """
+    ルームごとに新しい keep_per_room 件だけを残し、それより古いチャットを batch_size 件ずつ削除します。
+    削除した行数を返します。
+    """
+    rooms = [row[0] for row in db.session.query(ChatMessage.room_id).group_by(
+        ChatMessage.room_id).having(db.func.count(ChatMessage.id) > keep_per_room)]
+    deleted = 0
+    for room_id in rooms:
+        # 残す中で最も古いメッセージ (チャットの ID は投稿順に増える)
+        oldest_kept = db.session.query(ChatMessage.id).filter(ChatMessage.room_id == room_id).order_by(
+            ChatMessage.id.desc()).offset(keep_per_room - 1).limit(1).scalar()
+        while True:
+            rows = db.session.query(
+                ChatMessage.id, ChatMessage.room_id, ChatMessage.user_id, ChatMessage.message, ChatMessage.timestamp
+            ).filter(ChatMessage.room_id == room_id, ChatMessage.id < oldest_kept).order_by(
+                ChatMessage.id).limit(batch_size).all()
+            if not rows:
+                break
+            if archive:
+                archive.write('chat_message', [row._asdict() for row in rows])
+            db.session.execute(db.delete(ChatMessage).where(ChatMessage.id.in_([row.id for row in rows])))
+            db.session.commit()
+            deleted += len(rows)
+    return deleted
+
+def prune_ingest_keys(older_than_days, batch_size=1000):
+    """
+    older_than_days 日より古い冪等性キーを batch_size 件ずつ削除し、削除した行数を返します。
+    """
+    cutoff = _utcnow() - timedelta(days=older_than_days)
+    deleted = 0
+    while True:
+        ids = [row[0] for row in db.session.query(IngestKey.id).filter(
+            IngestKey.created_at < cutoff).order_by(IngestKey.id).limit(batch_size)]
+        if not ids:
+            break
+        db.session.execute(db.delete(IngestKey).where(IngestKey.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+    return deleted
+
+def run(app, activity_days=None, chat_per_room=None, batch_size=None, archive_dir=None):
+    """
+    設定値 (引数で上書き可) に従って ActivityLog の集約、チャットの削減、古い冪等性キーの削除を行い、結果をまとめた dict を返します。
+    """
+    activity_days = activity_days if activity_days is not None else app.config['RETENTION_ACTIVITY_DAYS']
+    chat_per_room = chat_per_room if chat_per_room is not None else app.config['RETENTION_CHAT_PER_ROOM']
+    batch_size = batch_size or app.config['RETENTION_BATCH_SIZE']
+    archive = _Archive(archive_dir or app.config['RETENTION_ARCHIVE_DIR'])
+
+    started = time.perf_counter()
+    activity_compacted, summaries_created = compact_activity(activity_days, batch_size, archive)
+    activity_seconds = time.perf_counter() - started
+    chat_deleted = trim_chat(chat_per_room, batch_size, archive) if chat_per_room > 0 else 0
+    chat_seconds = time.perf_counter() - started - activity_seconds
+    ingest_keys_deleted = prune_ingest_keys(app.config['RETENTION_INGEST_KEY_DAYS'], batch_size)
+    total_seconds = time.perf_counter() - started
+
+    return {
+        'activity_compacted': activity_compacted,
+        'summaries_created': summaries_created,
+        'activity_seconds': round(activity_seconds, 2),
+        'chat_deleted': chat_deleted,
+        'chat_seconds': round(chat_seconds, 2),
+        'ingest_keys_deleted': ingest_keys_deleted,
+        'rows_reclaimed': activity_compacted - summaries_created + chat_deleted + ingest_keys_deleted,
+        'seconds': round(total_seconds, 2),
+    }
@@ -0,0 +1,63 @@
+import threading
+import time
+from . import db
+from .models import WeeklyFocus, room_participants, week_start_of
+
+class RoomStats:
+    """
+    ルーム参加者全員の今週の集中時間を1クエリで集計し、ルームごとに短時間キャッシュします。
+    参加者がセッションを記録したときは invalidate_user で該当ルームを破棄します。
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self._rooms = {}  # room_id -> ({user_id: minutes}, loaded_at)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('ROOM_STATS_TTL', self.ttl)
+
+    def weekly_minutes(self, room_id):
+        """
+        {user_id: 今週の集中時間(分)} を返します。
+        """
+        with self._lock:
+            entry = self._rooms.get(room_id)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+            return entry[0]
+
+        rows = db.session.query(
+            room_participants.c.user_id,
+            db.func.coalesce(db.func.sum(WeeklyFocus.minutes), 0)
+        ).outerjoin(
+            WeeklyFocus, db.and_(
+                WeeklyFocus.user_id == room_participants.c.user_id,
+                WeeklyFocus.week_start == week_start_of()
+            )
+        ).filter(room_participants.c.room_id == room_id).group_by(room_participants.c.user_id)
+        minutes = {user_id: total for user_id, total in rows}
+
+        with self._lock:
+            self._rooms[room_id] = (minutes, time.monotonic())
+        return minutes
+
+    def invalidate(self, room_id):
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+    def invalidate_user(self, user_id):
+        """
+        指定したユーザーを含むキャッシュ済みのルームをすべて破棄します。
+        """
+        with self._lock:
+            for room_id in [room_id for room_id, (minutes, _) in self._rooms.items() if user_id in minutes]:
+                self._rooms.pop(room_id)
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+
+
+room_stats = RoomStats()
@@ -1,18 +1,36 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context
 import re
 from flask_login import login_user, logout_user, login_required, current_user
-from .models import User, FocusSession, ActivityLog, FocusRoom, ChatMessage
-from . import db
+from .models import User, FocusSession, FocusRoom, WeeklyFocus, week_start_of, room_participants
+from . import db, reports, feed, ingest, export
+from .presence import presence
+from .chat import chat_buffer, history_page
+from .membership import membership
+from .room_stats import room_stats
+from .follow_graph import follow_graph
+from .hashing import HashingBusy
+from .response_cache import response_cache
+from .report_cache import report_cache
 from sqlalchemy import func
-from datetime import date, timedelta, datetime
+from sqlalchemy.exc import IntegrityError
+from datetime import date
 
 main = Blueprint('main', __name__)
 
+# ログインなしで開けるエンドポイント (/metrics は Prometheus から読むのでトークンで判定する)
+PUBLIC_ENDPOINTS = {'main.login', 'main.register', 'metrics'}
+
 @main.before_app_request
 def before_request():
-    if not current_user.is_authenticated and request.endpoint and 'static' not in request.endpoint and request.endpoint != 'main.login' and request.endpoint != 'main.register':
+    if not current_user.is_authenticated and request.endpoint and 'static' not in request.endpoint and request.endpoint not in PUBLIC_ENDPOINTS:
         return redirect(url_for('main.login'))
 
+@main.app_errorhandler(HashingBusy)
+def hashing_busy(error):
+    # ログインが集中してハッシュ計算の待ちがあふれたら、並ばせずにすぐ断る
+    flash('サーバーが混雑しています。しばらくしてから再度お試しください。')
+    return redirect(request.url, code=303)
+
 @main.route('/')
 def index():
 	return redirect(url_for('main.dashboard'))
@@ -45,6 +63,7 @@ def register():
 
 		db.session.add(new_user)
 		db.session.commit()
+		response_cache.bump('users')
 
 		login_user(new_user)
 		return redirect(url_for('main.dashboard'))
@@ -76,130 +95,42 @@ def logout():
 @main.route('/dashboard')
 @login_required
 def dashboard():
-    my_sessions = FocusSession.query.filter_by(user_id=current_user.id).order_by(FocusSession.timestamp.desc()).all()
-    followed_users_ids = [user.id for user in current_user.followed]
-    followed_activity_logs = ActivityLog.query.filter(ActivityLog.user_id.in_(followed_users_ids)).order_by(ActivityLog.timestamp.desc()).all()
-    return render_template('dashboard.html', username=current_user.username, my_sessions=my_sessions, followed_activity_logs=followed_activity_logs)
+    my_sessions, sessions_cursor = feed.session_page(current_user.id)
+    followed_activity_logs, feed_cursor = feed.followed_activity_page(current_user.id)
+    return render_template('dashboard.html', username=current_user.username,
+                           my_sessions=my_sessions, sessions_cursor=sessions_cursor,
+                           followed_activity_logs=followed_activity_logs, feed_cursor=feed_cursor)
 
-@main.route('/report')
+@main.route('/api/feed')
 @login_required
-def report():
-    total_focus_time = db.session.query(func.sum(FocusSession.duration_minutes)).filter(FocusSession.user_id == current_user.id).scalar() or 0
-    total_sessions = FocusSession.query.filter_by(user_id=current_user.id).count()
-    total_flow_states = ActivityLog.query.filter_by(user_id=current_user.id, activity_type='flow_state').count()
-    avg_session_length = round(total_focus_time / total_sessions, 1) if total_sessions > 0 else 0
-
-    today = date.today()
-    chart_labels = []
-    my_chart_data = []
-    flow_chart_data = []
-    followed_avg_data = []
-
-    followed_users = current_user.followed.all()
-    num_followed = len(followed_users)
-
-    for i in range(6, -1, -1):
-        target_date = today - timedelta(days=i)
-        start_of_day = datetime.combine(target_date, datetime.min.time())
-        end_of_day = datetime.combine(target_date, datetime.max.time())
-        chart_labels.append(target_date.strftime('%m/%d'))
-        
-        my_daily_total = db.session.query(func.sum(FocusSession.duration_minutes)).filter(FocusSession.user_id == current_user.id, FocusSession.timestamp.between(start_of_day, end_of_day)).scalar() or 0
-        my_chart_data.append(my_daily_total)
+def api_feed():
+    try:
+        logs, next_cursor = feed.followed_activity_page(current_user.id, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'カーソルが不正です。'}), 400
+    return jsonify({
+        'html': render_template('_activity_rows.html', followed_activity_logs=logs),
+        'next_cursor': next_cursor
+    })
 
-        my_daily_flow_count = ActivityLog.query.filter(ActivityLog.user_id == current_user.id, ActivityLog.activity_type == 'flow_state', ActivityLog.timestamp.between(start_of_day, end_of_day)).count()
-        flow_chart_data.append(my_daily_flow_count)
+@main.route('/api/my_sessions')
+@login_required
+def api_my_sessions():
+    try:
+        sessions, next_cursor = feed.session_page(current_user.id, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'カーソルが不正です。'}), 400
+    return jsonify({
+        'html': render_template('_session_rows.html', my_sessions=sessions),
+        'next_cursor': next_cursor
+    })
 
-        if num_followed > 0:
-            followed_ids = [user.id for user in followed_users]
-            total_followed_minutes = db.session.query(func.sum(FocusSession.duration_minutes)).filter(FocusSession.user_id.in_(followed_ids), FocusSession.timestamp.between(start_of_day, end_of_day)).scalar() or 0
-            followed_avg_data.append(round(total_followed_minutes / num_followed, 1))
-        else:
-            followed_avg_data.append(0)
-
-    weekly_total_focus = sum(my_chart_data)
-    days_with_focus = sum(1 for x in my_chart_data if x > 0)
-    weekly_flow_count = sum(flow_chart_data)
-    is_improving = sum(my_chart_data[4:]) > sum(my_chart_data[:3]) # 直近3日とそれ以前4日の比較
-    consecutive_days = 0
-    temp_days = 0
-    for minutes in reversed(my_chart_data):
-        if minutes > 0:
-            temp_days += 1
-        else:
-            break
-    consecutive_days = temp_days
-
-    status_emoji = '🧐'
-    status_text = 'あなたの集中データを分析中です...'
-
-    # 優先度順
-    if total_sessions > 0:
-        if total_sessions <= 5:
-            status_emoji = '✨'
-            status_text = 'ようこそ！FocusFlowへ。一緒に頑張りましょう！'
-        elif total_flow_states == 1 and weekly_flow_count == 1:
-            status_emoji = '💡'
-            status_text = '初めてのフロー状態！この感覚、忘れないでください。'
-        elif weekly_total_focus > 1500 and days_with_focus == 7 and weekly_flow_count > 5:
-            status_emoji = '👑'
-            status_text = '絶対王者。もはや集中力の化身です。'
-        elif weekly_total_focus > 1200 and days_with_focus >= 6 and weekly_flow_count > 10:
-            status_emoji = '🎓'
-            status_text = '探求者。深い学問の海に潜っていますね。'
-        elif weekly_total_focus > 1000 and days_with_focus >= 6:
-            status_emoji = '🔥'
-            status_text = '絶好調！素晴らしい集中力です！'
-        elif weekly_total_focus > 800 and days_with_focus >= 5:
-            status_emoji = '🚀'
-            status_text = '生産性の鬼。非常に高い集中を維持しています。'
-        elif days_with_focus == 7:
-            status_emoji = '🏃'
-            status_text = '継続の達人。長距離ランナーのように着実です。'
-        elif consecutive_days >= 3:
-            status_emoji = '📈'
-            status_text = f'{consecutive_days}日連続で集中中！波に乗っています。'
-        elif days_with_focus == 1 and weekly_total_focus > 300:
-            status_emoji = '💥'
-            status_text = '一極集中。たった一日で驚異的な成果です！'
-        elif days_with_focus <= 3 and weekly_total_focus > 400:
-            status_emoji = '⚡'
-            status_text = '短期集中型。週末などに一気に集中するタイプですね。'
-        elif weekly_flow_count > 5 and weekly_total_focus > 500:
-            status_emoji = '🧘'
-            status_text = 'フローの探求者。質の高い集中を重視していますね。'
-        elif weekly_total_focus > 400 and days_with_focus >= 4:
-            status_emoji = '👍'
-            status_text = '良いペースです。着実に学習が習慣化していますね。'
-        elif is_improving and weekly_total_focus > 120:
-            status_emoji = '🌱'
-            status_text = '成長中！週の後半にかけて調子が上がっています。'
-        elif days_with_focus > 0 and my_chart_data[-1] > 0 and weekly_total_focus < 120:
-            status_emoji = '💪'
-            status_text = '再始動！ここからの巻き返しに期待です。'
-        elif avg_session_length > 0 and avg_session_length < 15:
-            status_emoji = '☕'
-            status_text = 'スキマ時間の活用。小さな積み重ねが力になります。'
-        elif weekly_total_focus > 0:
-            status_emoji = '🙂'
-            status_text = '学習を継続できています。まずは続けることが大切です。'
-        elif weekly_total_focus == 0:
-            status_emoji = '😴'
-            status_text = '少し休憩中かな？まずは短い時間から始めてみましょう。'
-
-    recent_sessions = FocusSession.query.filter_by(user_id=current_user.id).order_by(FocusSession.timestamp.desc()).limit(10).all()
-
-    return render_template('report.html',
-                           total_focus_time=total_focus_time,
-                           total_sessions=total_sessions,
-                           total_flow_states=total_flow_states,
-                           chart_labels=chart_labels,
-                           my_chart_data=my_chart_data,
-                           flow_chart_data=flow_chart_data,
-                           followed_avg_data=followed_avg_data,
-                           recent_sessions=recent_sessions,
-                           status_emoji=status_emoji,
-                           status_text=status_text)
+@main.route('/report')
+@login_required
+def report():
+    # 同じ日の2回目以降はキャッシュしたスナップショットをそのまま描画する (SQL なし)
+    snapshot = report_cache.get(current_user.id, reports.build_report)
+    return render_template('report.html', **snapshot)
 
 
 @main.route('/focus')
@@ -210,18 +141,24 @@ def focus():
 
 @main.route('/user/<username>')
 @login_required
+# 表示中のステータスは watch_user で接続直後に最新の値が送られるので、バージョンには含めない
+@response_cache.cached(lambda username: f'user:{username}')
 def user(username):
     user = User.query.filter_by(username=username).first_or_404()
     sessions = FocusSession.query.filter_by(user_id=user.id).order_by(FocusSession.timestamp.desc()).all()
-    return render_template('user.html', user=user, sessions=sessions)
+    status, gauge_level = presence.get(user)
+    return render_template('user.html', user=user, sessions=sessions, status=status, gauge_level=gauge_level,
+                           following_count=len(follow_graph.followed(user.id)),
+                           follower_count=len(follow_graph.followers(user.id)))
 
 @main.route('/api/user_status/<username>')
 @login_required
 def api_user_status(username):
     user = User.query.filter_by(username=username).first_or_404()
+    status, gauge_level = presence.get(user)
     return jsonify({
-        'status': user.status,
-        'gauge_level': user.current_gauge_level
+        'status': status,
+        'gauge_level': gauge_level
     })
 
 @main.route('/follow/<username>')
@@ -233,6 +170,8 @@ def follow(username):
         return redirect(url_for('main.user', username=username))
     current_user.follow(user)
     db.session.commit()
+    response_cache.bump(f'user:{user.username}', f'user:{current_user.username}')
+    report_cache.invalidate(current_user.id)
     flash(f'{user.username}さんをフォローしました。')
     return redirect(url_for('main.user', username=username))
 
@@ -245,30 +184,54 @@ def unfollow(username):
         return redirect(url_for('main.user', username=username))
     current_user.unfollow(user)
     db.session.commit()
+    response_cache.bump(f'user:{user.username}', f'user:{current_user.username}')
+    report_cache.invalidate(current_user.id)
     flash(f'{user.username}さんのフォローを解除しました。')
     return redirect(url_for('main.user', username=username))
 
 @main.route('/leaderboard')
 @login_required
+@response_cache.cached('sessions', 'rooms', 'users')
 def leaderboard():
-    # ユーザー週間ランキング
-    users = User.query.all()
-    for user in users:
-        user.weekly_focus = user.weekly_focus_time()
-    users.sort(key=lambda x: x.weekly_focus, reverse=True)
+    # ユーザー週間ランキング (集計テーブルから1クエリで並び替え)
+    this_week = week_start_of()
+    weekly_minutes = func.coalesce(WeeklyFocus.minutes, 0)
+    user_rows = db.session.query(User, weekly_minutes).outerjoin(
+        WeeklyFocus, db.and_(WeeklyFocus.user_id == User.id, WeeklyFocus.week_start == this_week)
+    ).order_by(weekly_minutes.desc(), User.id).all()
+    users = []
+    for user, minutes in user_rows:
+        user.weekly_focus = minutes
+        users.append(user)
     try:
         user_rank = users.index(current_user) + 1
     except ValueError:
         user_rank = None
 
-    # ルーム週間ランキング
-    rooms = FocusRoom.query.all()
-    for room in rooms:
-        room.weekly_focus_avg = room.weekly_focus_time_avg
-    rooms.sort(key=lambda x: x.weekly_focus_avg, reverse=True)
+    # ルーム週間ランキング (参加者の週間合計 / 参加者数)
+    num_participants = func.count(room_participants.c.user_id)
+    room_avg = db.case(
+        (num_participants == 0, 0),
+        else_=func.coalesce(func.sum(WeeklyFocus.minutes), 0) * 1.0 / num_participants
+    )
+    room_rows = db.session.query(FocusRoom, room_avg).outerjoin(
+        room_participants, room_participants.c.room_id == FocusRoom.id
+    ).outerjoin(
+        WeeklyFocus, db.and_(WeeklyFocus.user_id == room_participants.c.user_id, WeeklyFocus.week_start == this_week)
+    ).group_by(FocusRoom.id).order_by(room_avg.desc(), FocusRoom.id).all()
+    rooms = []
+    for room, avg in room_rows:
+        room.weekly_focus_avg = round(avg, 1)
+        rooms.append(room)
 
     return render_template('leaderboard.html', users=users, user_rank=user_rank, rooms=rooms)
 
+def _sessions_changed():
+    # 現在のユーザーのセッションが増えたときに関係するキャッシュを破棄する (コミット後に呼ぶ)
+    room_stats.invalidate_user(current_user.id)
+    response_cache.bump('sessions', f'user:{current_user.username}')
+    report_cache.invalidate(current_user.id)
+
 @main.route('/log_session', methods=['POST'])
 @login_required
 def log_session():
@@ -282,20 +245,11 @@ def log_session():
 	if int(duration_minutes) <= 0:
 		return jsonify({'status': 'success', 'message': '時間は記録されませんでした。'})
 
-	new_session = FocusSession(
-		task_name=task_name,
-		duration_minutes=int(duration_minutes),
-		author=current_user
-		)
-	db.session.add(new_session)
-
-	# アクティビティログに記録
-	activity = ActivityLog(user_id=current_user.id, activity_type='session_end', details=f'{task_name}|{int(duration_minutes)}')
-	db.session.add(activity)
-
-	current_user.status = 'オフライン'
-	current_user.current_gauge_level = 0
+	# セッション・週間集計・アクティビティログをまとめて記録
+	ingest.record_session(current_user.id, task_name, int(duration_minutes))
 	db.session.commit()
+	_sessions_changed()
+	presence.update(current_user.id, 'オフライン', 0)
 
 	return jsonify({'status': 'success'})
 
@@ -309,19 +263,18 @@ def update_user_status():
     if status is None:
         return jsonify({'status': 'error', 'message': 'ステータスが指定されていません。'}), 400
 
-    current_user.status = status
-    if gauge_level is not None:
-        current_user.current_gauge_level = int(gauge_level)
-    db.session.commit()
+    if gauge_level is None:
+        _, gauge_level = presence.get(current_user)
+    presence.update(current_user.id, status, gauge_level)
 
     return jsonify({'status': 'success'})
 
 @main.route('/flow_state_achieved', methods=['POST'])
 @login_required
 def flow_state_achieved():
-    log = ActivityLog(user_id=current_user.id, activity_type='flow_state')
-    db.session.add(log)
+    ingest.record_activity(current_user.id, 'flow_state')
     db.session.commit()
+    report_cache.invalidate(current_user.id)
     return jsonify({'status': 'success'})
 
 @main.route('/log_activity', methods=['POST'])
@@ -333,17 +286,65 @@ def log_activity():
     if not activity_type:
         return jsonify({'status': 'error', 'message': 'Activity type not provided'}), 400
     
-    log = ActivityLog(
-        user_id=current_user.id,
-        activity_type=activity_type,
-        details=details
-    )
-    db.session.add(log)
+    ingest.record_activity(current_user.id, activity_type, details)
     db.session.commit()
+    if activity_type == 'flow_state':
+        report_cache.invalidate(current_user.id)
     return jsonify({'status': 'success'})
 
+@main.route('/api/ingest', methods=['POST'])
+@login_required
+def api_ingest():
+    # オフライン中にためたセッションとアクティビティをまとめて受け取る
+    data = request.get_json(silent=True) or {}
+    try:
+        events = ingest.validate(data.get('events'))
+    except ingest.IngestError as e:
+        return jsonify({'status': 'error', 'message': str(e), 'index': e.index}), 400
+
+    try:
+        accepted, duplicates = ingest.apply(current_user.id, events)
+    except IntegrityError:
+        # 同じキーを含むバッチが同時に届いた場合は、やり直せば重複として読み飛ばされる
+        db.session.rollback()
+        try:
+            accepted, duplicates = ingest.apply(current_user.id, events)
+        except IntegrityError:
+            # それでも競合する場合はクライアントのキューに残して後で送り直してもらう
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': '同時に送信されたイベントと競合しました。再送してください。'}), 409
+
+    if any(event['type'] == 'session' for event in accepted):
+        _sessions_changed()
+    elif any(event.get('activity_type') == 'flow_state' for event in accepted):
+        report_cache.invalidate(current_user.id)
+
+    return jsonify({
+        'status': 'success',
+        'accepted': [event['key'] for event in accepted],
+        'duplicates': duplicates
+    })
+
+@main.route('/export/<kind>.<fmt>')
+@login_required
+def export_history(kind, fmt):
+    # 自分の履歴を CSV / NDJSON でストリーミングする (?from=YYYY-MM-DD&to=YYYY-MM-DD で期間を指定)
+    if kind not in export.KINDS or fmt not in export.FORMATS:
+        return jsonify({'status': 'error', 'message': 'エクスポートの種類か形式が不正です。'}), 404
+    try:
+        start = export.parse_date(request.args.get('from'))
+        end = export.parse_date(request.args.get('to'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': '日付は YYYY-MM-DD 形式で指定してください。'}), 400
+
+    body = export.stream(kind, fmt, user_id=current_user.id, start=start, end=end)
+    filename = f'focusflow-{kind}-{date.today().isoformat()}.{fmt}'
+    return Response(stream_with_context(body), content_type=export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 @main.route('/rooms')
 @login_required
+@response_cache.cached('rooms')
 def rooms():
     public_rooms = FocusRoom.query.filter_by(is_public=True).all()
     return render_template('rooms.html', rooms=public_rooms)
@@ -375,6 +376,8 @@ def create_room():
         db.session.add(new_room)
         new_room.participants.append(current_user)
         db.session.commit()
+        membership.invalidate(new_room.id)
+        response_cache.bump('rooms')
         
         flash('ルームが作成されました。')
         return redirect(url_for('main.room', room_id=new_room.id))
@@ -384,28 +387,53 @@ def create_room():
 @login_required
 def room(room_id):
     room = FocusRoom.query.get_or_404(room_id)
+    is_member = membership.is_member(room.id, current_user.id)
     
     # 参加者でなく、かつ非公開ルームの場合、パスワード入力ページへ
-    if current_user not in room.participants and not room.is_public:
+    if not is_member and not room.is_public:
         return redirect(url_for('main.join_room', room_id=room.id))
 
     # 公開ルームの場合、または既に参加済みの場合は、参加者リストに追加（重複はしない）
-    if current_user not in room.participants:
+    if not is_member:
         room.participants.append(current_user)
         db.session.commit()
+        membership.add(room.id, current_user.id)
+        room_stats.invalidate(room.id)
+        response_cache.bump('rooms')
+
+    # 参加者は一度だけ読み込み、週間集中時間はまとめて集計したものを使う
+    participants = room.participants.all()
+    weekly_minutes = room_stats.weekly_minutes(room.id)
+    for p in participants:
+        p.weekly_focus_time_in_room = weekly_minutes.get(p.id, 0)
+
+    # 直近のチャットをバッファから読み込む (現在の参加者のメッセージのみ)
+    participant_ids = {p.id for p in participants}
+    recent_messages = chat_buffer.recent(room.id)
+    chat_messages = [m for m in recent_messages if m.user_id in participant_ids]
+    # バッファが埋まっていればそれより古い履歴があるかもしれない (保存待ちのメッセージは id がないのでカーソルにしない)
+    oldest = recent_messages[0] if len(recent_messages) >= chat_buffer.size else None
+    history_cursor = feed.encode_cursor(oldest) if oldest is not None and oldest.id is not None else None
+
+    presences = presence.snapshot(participants)
+    return render_template('room.html', room=room, participants=participants, chat_messages=chat_messages,
+                           history_cursor=history_cursor, presences=presences)
+
+@main.route('/room/<int:room_id>/messages')
+@login_required
+def room_messages(room_id):
+    room = FocusRoom.query.get_or_404(room_id)
+    if current_user not in room.participants:
+        return jsonify({'status': 'error', 'message': 'このルームに参加していません。'}), 403
 
-    # 参加者の週間集中時間を計算
-    for p in room.participants:
-        p.weekly_focus_time_in_room = p.weekly_focus_time()
-
-    # チャット履歴を読み込む (現在の参加者のメッセージのみ)
-    participant_ids = [p.id for p in room.participants]
-    chat_messages = ChatMessage.query.filter(
-        ChatMessage.room_id == room.id,
-        ChatMessage.user_id.in_(participant_ids)
-    ).order_by(ChatMessage.timestamp.asc()).all()
-
-    return render_template('room.html', room=room, chat_messages=chat_messages)
+    try:
+        messages, next_cursor = history_page(room.id, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'カーソルが不正です。'}), 400
+    return jsonify({
+        'messages': [{'username': m.user.username, 'msg': m.message} for m in messages],
+        'next_cursor': next_cursor
+    })
 
 @main.route('/room/<int:room_id>/join', methods=['GET', 'POST'])
 @login_required
@@ -420,6 +448,9 @@ def join_room(room_id):
         if room.check_password(password):
             room.participants.append(current_user)
             db.session.commit()
+            membership.add(room.id, current_user.id)
+            room_stats.invalidate(room.id)
+            response_cache.bump('rooms')
             flash(f'ルーム「{room.name}」へようこそ！', 'success')
             return redirect(url_for('main.room', room_id=room.id))
         else:
@@ -434,6 +465,9 @@ def leave_room(room_id):
     if current_user in room.participants:
         room.participants.remove(current_user)
         db.session.commit()
+        membership.remove(room.id, current_user.id)
+        room_stats.invalidate(room.id)
+        response_cache.bump('rooms')
         flash(f'ルーム「{room.name}」から脱退しました。', 'success')
     return redirect(url_for('main.rooms'))
 
@@ -458,6 +492,9 @@ def kick_user(room_id, user_id):
 
     room.participants.remove(user_to_kick)
     db.session.commit()
+    membership.remove(room.id, user_to_kick.id)
+    room_stats.invalidate(room.id)
+    response_cache.bump('rooms')
     flash(f'{user_to_kick.username}をルームからキックしました。', 'success')
     return redirect(url_for('main.room', room_id=room.id))
 
@@ -472,5 +509,9 @@ def delete_room_route(room_id):
 
     db.session.delete(room)
     db.session.commit()
+    chat_buffer.evict(room_id)
+    membership.invalidate(room_id)
+    room_stats.invalidate(room_id)
+    response_cache.bump('rooms')
     flash(f'ルーム「{room.name}」を削除しました。', 'success')
     return redirect(url_for('main.rooms'))
\ No newline at end of file
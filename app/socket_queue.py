@@ -0,0 +1,180 @@
+import json
+import select
+import socket
+import socketio
+from socketio import PubSubManager
+
+# キャッシュ同期用のメッセージ (socket.io のメッセージと区別するためのメソッド名)
+SYNC_METHOD = 'focusflow_sync'
+
+class ClusterSync:
+    """
+    ワーカーごとに持っているキャッシュ (チャットのバッファ・ステータス) の更新を、
+    Socket.IO と同じメッセージキューで他のワーカーに伝えます。
+    キューを使わない単一ワーカー構成では publish は何もしません。
+    """
+
+    def __init__(self):
+        self.manager = None
+        self._handlers = {}
+
+    def on(self, kind):
+        """
+        他のワーカーから kind の更新が届いたときに呼ばれる関数を登録するデコレーター。
+        handler(**payload) の形で、キューの受信スレッドから呼ばれます (DB には触らないこと)。
+        """
+        def register(handler):
+            self._handlers[kind] = handler
+            return handler
+        return register
+
+    def start(self, server):
+        """
+        最初のソケット接続を待たずにキューの受信を始めます (接続のないワーカーもキャッシュを更新するため)。
+        """
+        if self.manager is not None and not server.manager_initialized:
+            server.manager_initialized = True
+            self.manager.initialize()
+
+    def publish(self, kind, **payload):
+        if self.manager is not None:
+            self.manager.publish_sync(kind, payload)
+
+    def dispatch(self, kind, payload):
+        handler = self._handlers.get(kind)
+        if handler is not None:
+            handler(**payload)
+
+
+cluster = ClusterSync()
+
+class SyncMixin:
+    """
+    PubSubManager に混ぜて (継承の先頭に置く)、キャッシュ同期のメッセージを送受信できるようにします。
+    受信したものは socket.io には渡さず cluster に振り分けます。
+    """
+
+    def publish_sync(self, kind, payload):
+        self._publish({'method': SYNC_METHOD, 'host_id': self.host_id, 'kind': kind, 'payload': payload})
+
+    def _listen(self):
+        for message in super()._listen():
+            data = message
+            if isinstance(message, (str, bytes)):
+                try:
+                    data = json.loads(message)
+                except ValueError:
+                    yield message
+                    continue
+            if not isinstance(data, dict) or data.get('method') != SYNC_METHOD:
+                yield message
+                continue
+            if data.get('host_id') == self.host_id:
+                continue
+            try:
+                cluster.dispatch(data['kind'], data['payload'])
+            except Exception:
+                self._get_logger().exception('cache sync handler failed: %s', data.get('kind'))
+
+
+class LoopbackManager(PubSubManager):
+    """
+    外部サービスなしで同じマシン上の複数ワーカー間にブロードキャストを届けるための
+    UDP ループバック版メッセージキュー。開発・検証用です。
+
+    URL は loopback://127.0.0.1:5800-5807 の形式で、各ワーカーは範囲内の空いている
+    ポートを1つ使い、送信時は範囲内のすべてのポートに送ります。
+    """
+    name = 'loopback'
+
+    def __init__(self, url='loopback://127.0.0.1:5800-5807', channel='socketio',
+                 write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.host, self.ports = parse_loopback_url(url)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.port = None
+        if not write_only:
+            self.port = self._bind()
+
+    def _bind(self):
+        for port in self.ports:
+            try:
+                self.sock.bind((self.host, port))
+            except OSError:
+                continue
+            self.sock.setblocking(False)
+            return port
+        raise RuntimeError(f'loopback: {self.ports[0]}-{self.ports[-1]} に空きポートがありません')
+
+    def _publish(self, data):
+        payload = json.dumps({'channel': self.channel, 'message': data}).encode()
+        for port in self.ports:
+            if port != self.port:
+                self.sock.sendto(payload, (self.host, port))
+
+    def _wait_readable(self):
+        # 受信があるまで眠る関数を非同期モードに合わせて選ぶ (ポーリングで起き続けないように)
+        mode = getattr(self.server, 'async_mode', 'threading')
+        if mode == 'eventlet':
+            from eventlet.hubs import trampoline
+            return lambda: trampoline(self.sock, read=True)
+        if mode.startswith('gevent'):
+            from gevent.socket import wait_read
+            return lambda: wait_read(self.sock.fileno())
+        # threading モードでは受信は専用のスレッドなので、そのままブロックしてよい
+        return lambda: select.select([self.sock], [], [])
+
+    def _listen(self):
+        wait = self._wait_readable()
+        while True:
+            wait()
+            try:
+                payload, _ = self.sock.recvfrom(65535)
+            except BlockingIOError:
+                continue
+            try:
+                envelope = json.loads(payload)
+            except ValueError:
+                continue
+            if envelope.get('channel') == self.channel:
+                yield envelope['message']
+
+
+def parse_loopback_url(url):
+    host_port = url[len('loopback://'):]
+    host, _, ports = host_port.rpartition(':')
+    first, _, last = ports.partition('-')
+    return host or '127.0.0.1', list(range(int(first), int(last or first) + 1))
+
+def _queue_class(url):
+    # Flask-SocketIO と同じ振り分けで、キャッシュ同期を混ぜたクラスを作る
+    if url.startswith('loopback://'):
+        base = LoopbackManager
+    elif url.startswith(('redis://', 'rediss://')):
+        base = socketio.RedisManager
+    elif url.startswith('kafka://'):
+        base = socketio.KafkaManager
+    elif url.startswith('zmq'):
+        base = socketio.ZmqManager
+    else:
+        base = socketio.KombuManager
+    return type('Sync' + base.__name__, (SyncMixin, base), {})
+
+def socketio_options(app):
+    """
+    SOCKETIO_MESSAGE_QUEUE の設定から SocketIO.init_app に渡すオプションを作り、
+    同じキューを cluster (キャッシュ同期) にも使います。
+    loopback:// は serve.py から起動されたワーカー (SOCKETIO_LOOPBACK_LISTEN) だけがポートを使い、
+    それ以外のプロセスは送信だけ行います。
+    """
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if not url:
+        cluster.manager = None
+        return {}
+    options = {'channel': channel}
+    if url.startswith('loopback://'):
+        options['write_only'] = not app.config.get('SOCKETIO_LOOPBACK_LISTEN')
+    manager = _queue_class(url)(url, **options)
+    cluster.manager = manager
+    return {'client_manager': manager}
@@ -0,0 +1,4 @@
+"""
+FocusFlow の性能計測用スクリプト群。
+各モジュールは python -m benchmarks.<名前> で実行します。
+"""
@@ -0,0 +1,175 @@
+"""
+主要なページ・API とソケットイベントのレイテンシと1リクエストあたりのクエリ数を計測します。
+
+使い捨ての SQLite データベースにベンチマーク用データを投入し、Flask のテストクライアントと
+Flask-SocketIO のテストクライアントで各エンドポイントを繰り返し呼び出します。
+結果は JSON で保存できるので、変更前後の実行結果を比べて性能の劣化を確認できます。
+
+    python -m benchmarks.load --users 500 --iterations 200 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from .seed import Scale, seed, email_of, PASSWORD
+from .stats import summarize
+
+class QueryCounter:
+    """
+    エンジンで実行された SQL 文の数を数えます。
+    """
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'after_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def _measure(counter, func, iterations, warmup, prepare=None):
+    # prepare は毎回の呼び出しの前に実行し、計測には含めない (キャッシュを空にするなど)
+    for _ in range(warmup):
+        if prepare is not None:
+            prepare()
+        func()
+    samples = []
+    queries = []
+    for _ in range(iterations):
+        if prepare is not None:
+            prepare()
+        before = counter.count
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count - before)
+    result = summarize(samples)
+    result['queries_per_request'] = round(sum(queries) / len(queries), 2)
+    result['max_queries'] = max(queries)
+    return result
+
+def _expect(response, name):
+    if response.status_code != 200:
+        raise RuntimeError(f'{name} が {response.status_code} を返しました。')
+
+def run(scale, iterations, warmup):
+    # TestingConfig はインポート時に TEST_DATABASE_URL を読むので、app より先に設定する
+    scratch = tempfile.mkdtemp(prefix='focusflow-bench-')
+    os.environ['TEST_DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.sqlite')
+    from app import create_app, db, socketio
+    from app.chat import chat_writer
+    from app.models import ChatMessage
+    from app.response_cache import response_cache
+    from app.report_cache import report_cache
+
+    app = create_app('testing')
+    with app.app_context():
+        started = time.perf_counter()
+        user_ids, room_ids = seed(scale)
+        seed_seconds = time.perf_counter() - started
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    response = client.post('/login', data={'email': email_of(0), 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError('ベンチマーク用ユーザーでログインできませんでした。')
+    room_id = room_ids[0]
+
+    def get(url):
+        def request():
+            _expect(client.get(url), url)
+        return request
+
+    def post_json(url, payload):
+        def request():
+            _expect(client.post(url, json=payload), url)
+        return request
+
+    def clear_page_caches():
+        response_cache.clear()
+        report_cache.clear()
+
+    routes = {
+        '/leaderboard': get('/leaderboard'),
+        '/report': get('/report'),
+        '/dashboard': get('/dashboard'),
+        '/room/<id>': get(f'/room/{room_id}'),
+        '/log_session': post_json('/log_session', {'task_name': 'benchmark', 'duration_minutes': 25}),
+        '/update_user_status': post_json('/update_user_status', {'status': 'フォーカス中', 'gauge_level': 50}),
+    }
+    # ページのキャッシュに載るルートは、毎回キャッシュを空にした計測 (cold) も別に行う
+    # (キャッシュが効いた計測だけではルート自体のクエリや描画の劣化が見えない)
+    cold_routes = ('/leaderboard', '/report')
+    results = {'routes': {}, 'socket': {}}
+    for name, request in routes.items():
+        if name in cold_routes:
+            results['routes'][name + ' (cold)'] = _measure(counter, request, iterations, warmup,
+                                                            prepare=clear_page_caches)
+        results['routes'][name] = _measure(counter, request, iterations, warmup)
+
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    # ソケットイベントは応答を返さないので、ハンドラが終わるまでの時間を計測する
+    events = {
+        'join': lambda: socket_client.emit('join', {'room_id': str(room_id)}),
+        'update_status': lambda: socket_client.emit('update_status', {'room_id': str(room_id), 'status': 'フォーカス中', 'gauge_level': 50}),
+        # on_room_chat は5文字を超えるメッセージを捨てるので、保存・配信される長さにする
+        'room_chat': lambda: socket_client.emit('room_chat', {'room_id': str(room_id), 'msg': 'bench'}),
+    }
+    for name, emit in events.items():
+        results['socket'][name] = _measure(counter, emit, iterations, warmup)
+        received = socket_client.get_received()
+        if name == 'room_chat' and not any(packet['name'] == 'new_chat_message' for packet in received):
+            raise RuntimeError('room_chat のメッセージが配信されませんでした。')
+    socket_client.disconnect()
+    with app.app_context():
+        chat_writer.flush()
+        persisted = ChatMessage.query.filter_by(room_id=room_id, message='bench').count()
+    if persisted != iterations + warmup:
+        raise RuntimeError(f'room_chat のメッセージが {iterations + warmup} 件中 {persisted} 件しか保存されませんでした。')
+    with app.app_context():
+        db.engine.dispose()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    results.update(
+        started_at=datetime.now().isoformat(timespec='seconds'),
+        python=platform.python_version(),
+        async_mode=socketio.async_mode,
+        scale=scale.as_dict(),
+        iterations=iterations,
+        seed_seconds=round(seed_seconds, 2),
+    )
+    return results
+
+def print_results(results):
+    print(f"データ投入: {results['seed_seconds']}秒  規模: {results['scale']}")
+    print(f"{'対象':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'クエリ':>8}")
+    for group in ('routes', 'socket'):
+        for name, result in results[group].items():
+            print(f"{name:<24}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}{result['queries_per_request']:>8}")
+
+if __name__ == '__main__':
+    defaults = Scale()
+    parser = argparse.ArgumentParser(description='主要なエンドポイントとソケットイベントの性能を計測します。')
+    parser.add_argument('--users', type=int, default=defaults.users, help='ユーザー数')
+    parser.add_argument('--follows', type=int, default=defaults.follows_per_user, help='1人あたりのフォロー数')
+    parser.add_argument('--sessions', type=int, default=defaults.sessions_per_user, help='1人あたりのセッション数')
+    parser.add_argument('--rooms', type=int, default=defaults.rooms, help='ルーム数')
+    parser.add_argument('--participants', type=int, default=defaults.participants_per_room, help='1ルームあたりの参加者数')
+    parser.add_argument('--chat', type=int, default=defaults.chat_per_room, help='1ルームあたりのチャット件数')
+    parser.add_argument('--iterations', type=int, default=100, help='1つの対象あたりの計測回数')
+    parser.add_argument('--warmup', type=int, default=5, help='計測前に捨てる呼び出し回数')
+    parser.add_argument('--output', type=str, help='結果を保存する JSON ファイル')
+
+    args = parser.parse_args()
+    scale = Scale(users=args.users, follows_per_user=args.follows, sessions_per_user=args.sessions,
+                  rooms=args.rooms, participants_per_room=args.participants, chat_per_room=args.chat)
+    results = run(scale, args.iterations, args.warmup)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に保存しました。")
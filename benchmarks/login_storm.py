@@ -0,0 +1,87 @@
+"""
+ログインが集中している間の Socket.IO イベント遅延を計測します。
+
+eventlet 上で、ログイン要求を送り続けるグリーンスレッドと、一定間隔で
+update_status を送って応答までの時間を測るグリーンスレッドを同時に動かします。
+HASH_POOL_SIZE=0 (その場で計算) と既定のスレッドプールの両方で計測し、
+プールを使うとイベント遅延がログイン数に関わらずほぼ一定になることを確認します。
+
+    python -m benchmarks.login_storm --logins 200 --concurrency 20
+"""
+import argparse
+import time
+from .stats import summarize
+
+def run_storm(pool_size, logins, concurrency, probe_interval):
+    import eventlet
+    from app import create_app, db, socketio
+    from app.models import User, FocusRoom
+    from app.hashing import password_hasher
+
+    app = create_app('testing')
+    app.config['HASH_POOL_SIZE'] = pool_size
+    app.config['HASH_QUEUE_LIMIT'] = concurrency * 2
+    password_hasher.init_app(app)
+    if socketio.async_mode != 'eventlet':
+        raise SystemExit('このベンチマークには eventlet が必要です。')
+
+    with app.app_context():
+        user = User(email='storm@example.com', username='storm')
+        user.set_password('password')
+        db.session.add(user)
+        room = FocusRoom(name='storm-room', owner=user)
+        db.session.add(room)
+        room.participants.append(user)
+        db.session.commit()
+        room_id = room.id
+
+    probe_client = app.test_client()
+    probe_client.post('/login', data={'email': 'storm@example.com', 'password': 'password'})
+    socket_client = socketio.test_client(app, flask_test_client=probe_client)
+    socket_client.emit('join', {'room_id': str(room_id)})
+
+    remaining = [logins]
+    def login_worker():
+        client = app.test_client()
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            client.post('/login', data={'email': 'storm@example.com', 'password': 'password'})
+            eventlet.sleep(0)
+
+    latencies = []
+    def probe():
+        # 送信予定時刻からの遅れも含めて測る (ループが止まっていればその分遅れる)
+        scheduled = time.perf_counter()
+        while remaining[0] > 0:
+            socket_client.emit('update_status', {'room_id': str(room_id), 'status': 'フォーカス中', 'gauge_level': 50})
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            scheduled += probe_interval
+            eventlet.sleep(max(0, scheduled - time.perf_counter()))
+
+    started = time.perf_counter()
+    pool = eventlet.GreenPool(concurrency + 1)
+    pool.spawn(probe)
+    for _ in range(concurrency):
+        pool.spawn(login_worker)
+    pool.waitall()
+    elapsed = time.perf_counter() - started
+
+    socket_client.disconnect()
+    result = summarize(latencies)
+    result.update(pool_size=pool_size, logins=logins, seconds=round(elapsed, 2))
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ログイン集中時のソケットイベント遅延を計測します。')
+    parser.add_argument('--logins', type=int, default=100, help='ログイン要求の総数')
+    parser.add_argument('--concurrency', type=int, default=10, help='同時にログインするクライアント数')
+    parser.add_argument('--probe-interval', type=float, default=0.01, help='遅延計測イベントの送信間隔 (秒)')
+    parser.add_argument('--pool-size', type=int, default=2, help='プール使用時のスレッド数')
+
+    args = parser.parse_args()
+    for pool_size in (0, args.pool_size):
+        result = run_storm(pool_size, args.logins, args.concurrency, args.probe_interval)
+        label = 'インライン' if pool_size == 0 else f'プール({pool_size})'
+        print(f"{label}: ログイン{result['logins']}件 {result['seconds']}秒 "
+              f"イベント遅延 p50={result['p50_ms']}ms p95={result['p95_ms']}ms 最大={result['max_ms']}ms "
+              f"(計測{result['count']}回)")
@@ -0,0 +1,95 @@
+"""
+ベンチマーク用のデータをモデル経由でまとめて投入します。
+"""
+import random
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+
+# 全ユーザー共通のパスワード (ハッシュ計算は1回だけ行う)
+PASSWORD = 'benchmark'
+
+@dataclass
+class Scale:
+    users: int = 200
+    follows_per_user: int = 10
+    sessions_per_user: int = 20
+    rooms: int = 20
+    participants_per_room: int = 10
+    chat_per_room: int = 100
+    days: int = 28
+
+    def as_dict(self):
+        return asdict(self)
+
+def email_of(index):
+    return f'bench{index}@example.com'
+
+def seed(scale, random_seed=0):
+    """
+    scale に従ってユーザー、フォロー関係、セッション、アクティビティ、ルーム、チャットを投入し、
+    週間集計と累計カウンタを作り直します。アプリケーションコンテキスト内で呼び出してください。
+    """
+    from app import db
+    from app.models import (User, FocusSession, ActivityLog, FocusRoom, ChatMessage, WeeklyFocus,
+                            followers, room_participants)
+    from app.hashing import password_hasher
+    from app import counters
+
+    rng = random.Random(random_seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    def random_time():
+        return now - timedelta(minutes=rng.randrange(scale.days * 24 * 60))
+
+    password_hash = password_hasher.generate(PASSWORD)
+    db.session.execute(db.insert(User), [
+        {'email': email_of(i), 'username': f'bench{i}', 'password_hash': password_hash}
+        for i in range(scale.users)
+    ])
+    user_ids = [row[0] for row in db.session.query(User.id).order_by(User.id)]
+
+    follow_rows = []
+    for user_id in user_ids:
+        others = [other for other in rng.sample(user_ids, min(scale.follows_per_user + 1, len(user_ids)))
+                  if other != user_id][:scale.follows_per_user]
+        follow_rows.extend({'follower_id': user_id, 'followed_id': other} for other in others)
+    if follow_rows:
+        db.session.execute(followers.insert(), follow_rows)
+
+    session_rows = []
+    activity_rows = []
+    for user_id in user_ids:
+        for _ in range(scale.sessions_per_user):
+            minutes = rng.choice((15, 25, 25, 50))
+            timestamp = random_time()
+            session_rows.append({'user_id': user_id, 'task_name': 'benchmark', 'duration_minutes': minutes, 'timestamp': timestamp})
+            activity_rows.append({'user_id': user_id, 'activity_type': 'session_end', 'details': f'benchmark|{minutes}', 'timestamp': timestamp})
+            if rng.random() < 0.3:
+                activity_rows.append({'user_id': user_id, 'activity_type': 'flow_state', 'timestamp': timestamp})
+    if session_rows:
+        db.session.execute(db.insert(FocusSession), session_rows)
+        db.session.execute(db.insert(ActivityLog), activity_rows)
+
+    db.session.execute(db.insert(FocusRoom), [
+        {'name': f'bench-room{i}', 'owner_id': user_ids[i % len(user_ids)], 'is_public': True}
+        for i in range(scale.rooms)
+    ])
+    room_ids = [row[0] for row in db.session.query(FocusRoom.id).order_by(FocusRoom.id)]
+
+    participant_rows = []
+    chat_rows = []
+    for index, room_id in enumerate(room_ids):
+        owner_id = user_ids[index % len(user_ids)]
+        members = {owner_id} | set(rng.sample(user_ids, min(scale.participants_per_room, len(user_ids))))
+        participant_rows.extend({'room_id': room_id, 'user_id': user_id} for user_id in members)
+        members = sorted(members)
+        chat_rows.extend({'room_id': room_id, 'user_id': rng.choice(members), 'message': f'message {n}', 'timestamp': random_time()}
+                         for n in range(scale.chat_per_room))
+    if participant_rows:
+        db.session.execute(room_participants.insert(), participant_rows)
+    if chat_rows:
+        db.session.execute(db.insert(ChatMessage), chat_rows)
+    db.session.commit()
+
+    WeeklyFocus.rebuild()
+    counters.reconcile()
+    return user_ids, room_ids
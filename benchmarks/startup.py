@@ -0,0 +1,75 @@
+"""
+Web アプリと管理コマンドのコールドスタート時間 (プロセス起動から終了まで) を計測します。
+
+各コマンドを新しい Python プロセスで繰り返し実行し、使い捨ての SQLite データベースを
+使って p50/最小/最大のミリ秒を表示します。最初の1回はテーブル作成を含むので別に表示します。
+
+    python -m benchmarks.startup --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from .stats import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (名前, コマンド)
+COMMANDS = [
+    ('web: create_app()', [sys.executable, '-c', 'from app import create_app; create_app()']),
+    ('admin.py list-users', [sys.executable, 'admin.py', 'list-users', '--max-id', '0']),
+    ('admin.py list-rooms', [sys.executable, 'admin.py', 'list-rooms', '--max-id', '0']),
+    ('migrate_db.py', [sys.executable, 'migrate_db.py']),
+]
+
+def _run_once(command, env):
+    started = time.perf_counter()
+    subprocess.run(command, cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - started) * 1000
+
+def run(runs):
+    scratch = tempfile.mkdtemp(prefix='focusflow-startup-')
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(scratch, 'startup.sqlite'),
+               PYTHONWARNINGS='ignore')
+    try:
+        # 新しいデータベースでの初回起動 (テーブル作成とマイグレーションを含む)
+        first_start_ms = round(_run_once(COMMANDS[0][1], env), 2)
+        results = {}
+        for name, command in COMMANDS:
+            results[name] = summarize([_run_once(command, env) for _ in range(runs)])
+        # インタープリタ自体の起動時間 (比較用)
+        baseline = summarize([_run_once([sys.executable, '-c', 'pass'], env) for _ in range(runs)])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'runs': runs,
+        'first_start_ms': first_start_ms,
+        'interpreter': baseline,
+        'commands': results,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Web アプリと管理コマンドの起動時間を計測します。')
+    parser.add_argument('--runs', type=int, default=5, help='コマンドごとの実行回数')
+    parser.add_argument('--output', type=str, help='結果を保存する JSON ファイル')
+
+    args = parser.parse_args()
+    results = run(args.runs)
+    print(f"新しいデータベースでの初回起動: {results['first_start_ms']}ms")
+    print(f"{'対象':<24}{'p50':>9}{'最小':>9}{'最大':>9}")
+    rows = [('python (何もしない)', results['interpreter'])] + list(results['commands'].items())
+    for name, result in rows:
+        print(f"{name:<24}{result['p50_ms']:>9}{result['min_ms']:>9}{result['max_ms']:>9}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に保存しました。")
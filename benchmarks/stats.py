@@ -0,0 +1,20 @@
+import statistics
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(samples_ms):
+    """
+    ミリ秒のサンプル列から p50/p95/p99/最小/最大を求めます。
+    """
+    if not samples_ms:
+        return {'count': 0, 'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0, 'min_ms': 0, 'max_ms': 0}
+    return {
+        'count': len(samples_ms),
+        'p50_ms': round(statistics.median(samples_ms), 2),
+        'p95_ms': round(percentile(samples_ms, 0.95), 2),
+        'p99_ms': round(percentile(samples_ms, 0.99), 2),
+        'min_ms': round(min(samples_ms), 2),
+        'max_ms': round(max(samples_ms), 2),
+    }
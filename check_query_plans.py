@@ -0,0 +1,86 @@
+import os
+import re
+import sys
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User
+
+# ランキングや一覧のように、全件を読むこと自体が仕様のページで許可するテーブル
+ALLOWED_SCANS = {
+    '/leaderboard': {'user', 'focus_room', 'room_participants'},
+    '/rooms': {'focus_room'},
+}
+
+# SCAN CONSTANT ROW は FROM のない SELECT (スカラーサブクエリの足し算など) なので対象外
+SCAN_PATTERN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)')
+
+def _target_urls(user):
+    urls = ['/dashboard', '/report', '/leaderboard', '/rooms', '/my_rooms',
+            f'/user/{user.username}', f'/api/user_status/{user.username}', '/api/feed', '/api/my_sessions']
+    room = user.joined_rooms.first()
+    if room is not None:
+        urls.append(f'/room/{room.id}')
+    return urls
+
+def check_query_plans():
+    """
+    主要ページで実行されるクエリに EXPLAIN QUERY PLAN をかけ、
+    インデックスを使わない全件スキャンがあれば一覧にして終了コード1で終わります。
+    """
+    # 環境変数FLASK_APPを設定
+    os.environ['FLASK_APP'] = 'run.py'
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print("このチェックは SQLite のみ対応しています。")
+            return 0
+
+        user = User.query.first()
+        if user is None:
+            print("ユーザーが存在しないためチェックできません。")
+            return 0
+        urls = _target_urls(user)
+        user_id = user.id
+
+        captured = []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                captured.append((statement, parameters))
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+
+        failures = []
+        for url in urls:
+            captured.clear()
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            try:
+                response = client.get(url)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', capture)
+            if response.status_code != 200:
+                failures.append((url, f'HTTP {response.status_code}', ''))
+                continue
+
+            allowed = ALLOWED_SCANS.get(url, set())
+            for statement, parameters in list(captured):
+                plan = db.session.connection().exec_driver_sql(
+                    'EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                for row in plan:
+                    detail = row[-1]
+                    match = SCAN_PATTERN.match(detail)
+                    if match and match.group(1) not in allowed:
+                        failures.append((url, detail, ' '.join(statement.split())))
+
+        for url in urls:
+            status = 'NG' if any(f[0] == url for f in failures) else 'OK'
+            print(f"[{status}] {url}")
+        for url, detail, statement in failures:
+            print(f"--- {url}: {detail}")
+            if statement:
+                print(f"    {statement}")
+        return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(check_query_plans())
@@ -0,0 +1,127 @@
+import os
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    return value.lower() in ('1', 'true', 'yes', 'on') if value else default
+
+def _database_url(default):
+    url = os.environ.get('DATABASE_URL', default)
+    # 一部のホスティングが渡す古いスキーム名を SQLAlchemy が理解できる形に直す
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+class Config:
+    # 時間できたらhttps化
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key') # 後で変更
+    SQLALCHEMY_DATABASE_URI = _database_url('sqlite:///db.sqlite')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite 用の接続時 PRAGMA
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+    SQLITE_MMAP_SIZE = _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+
+    # PostgreSQL などプール付きのデータベース用
+    DB_POOL_SIZE = _env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW', 20)
+    DB_POOL_RECYCLE = _env_int('DB_POOL_RECYCLE', 1800)
+    DB_POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT', 30)
+
+    # パスワードのハッシュ計算を行うスレッド数と、同時に受け付ける上限
+    HASH_POOL_SIZE = _env_int('HASH_POOL_SIZE', 2)
+    HASH_QUEUE_LIMIT = _env_int('HASH_QUEUE_LIMIT', 32)
+
+    # ステータスのハートビートと DB への書き戻し間隔 (秒)
+    PRESENCE_TTL_SECONDS = _env_int('PRESENCE_TTL_SECONDS', 30)
+    PRESENCE_FLUSH_INTERVAL = _env_int('PRESENCE_FLUSH_INTERVAL', 10)
+
+    # ルームページに表示する直近チャット件数と、メモリに保持するルーム数の上限
+    CHAT_BUFFER_SIZE = _env_int('CHAT_BUFFER_SIZE', 50)
+    CHAT_BUFFER_ROOMS = _env_int('CHAT_BUFFER_ROOMS', 200)
+    # 他のワーカーからの更新を取りこぼしても、この秒数ごとに DB から読み直す
+    CHAT_BUFFER_TTL = _env_int('CHAT_BUFFER_TTL', 300)
+
+    # チャットをまとめて保存する件数と間隔 (秒)
+    CHAT_FLUSH_BATCH = _env_int('CHAT_FLUSH_BATCH', 50)
+    CHAT_FLUSH_INTERVAL = float(os.environ.get('CHAT_FLUSH_INTERVAL', 1.0))
+
+    # 複数ワーカーでブロードキャストを共有するためのメッセージキュー
+    # 例: redis://localhost:6379/0, loopback://127.0.0.1:5800-5807 (単一マシンでの検証用)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'focusflow')
+    # loopback:// のポートで受信するか (serve.py が起動したワーカーだけ。他のプロセスは送信のみ)
+    SOCKETIO_LOOPBACK_LISTEN = _env_bool('SOCKETIO_LOOPBACK_LISTEN')
+
+    # ルーム参加者キャッシュを DB から読み直す間隔 (秒)
+    ROOM_MEMBERSHIP_TTL = _env_int('ROOM_MEMBERSHIP_TTL', 60)
+    # 参加者でないという確認結果を使い回す時間 (秒)
+    ROOM_MEMBERSHIP_NEGATIVE_TTL = _env_int('ROOM_MEMBERSHIP_NEGATIVE_TTL', 5)
+
+    # ルームページの参加者統計をキャッシュする時間 (秒)
+    ROOM_STATS_TTL = _env_int('ROOM_STATS_TTL', 30)
+
+    # フォロー関係キャッシュの読み直し間隔 (秒) と保持するユーザー数の上限
+    FOLLOW_GRAPH_TTL = _env_int('FOLLOW_GRAPH_TTL', 60)
+    FOLLOW_GRAPH_USERS = _env_int('FOLLOW_GRAPH_USERS', 10000)
+
+    # ログインユーザーのスナップショットをキャッシュする時間 (秒)
+    IDENTITY_CACHE_TTL = _env_int('IDENTITY_CACHE_TTL', 30)
+    # admin.py での一括削除などを確認するため、キャッシュの版数を DB から読む間隔 (秒)
+    CACHE_STAMP_INTERVAL = _env_int('CACHE_STAMP_INTERVAL', 2)
+
+    # ページのレスポンスキャッシュの有効期間 (秒) と本文の合計サイズの上限 (バイト)
+    RESPONSE_CACHE_TTL = _env_int('RESPONSE_CACHE_TTL', 30)
+    RESPONSE_CACHE_BYTES = _env_int('RESPONSE_CACHE_BYTES', 8 * 1024 * 1024)
+
+    # レポートページの計算結果をキャッシュする時間 (秒) と保持するユーザー数の上限
+    REPORT_CACHE_TTL = _env_int('REPORT_CACHE_TTL', 600)
+    REPORT_CACHE_USERS = _env_int('REPORT_CACHE_USERS', 5000)
+
+    # ActivityLog を日別集計にまとめるまでの日数と、ルームごとに残すチャット件数
+    RETENTION_ACTIVITY_DAYS = _env_int('RETENTION_ACTIVITY_DAYS', 90)
+    RETENTION_CHAT_PER_ROOM = _env_int('RETENTION_CHAT_PER_ROOM', 1000)
+    RETENTION_BATCH_SIZE = _env_int('RETENTION_BATCH_SIZE', 1000)
+    # /api/ingest の冪等性キーを保持する日数 (受け付けるイベントの古さの上限 ingest.MAX_EVENT_AGE より長くする)
+    RETENTION_INGEST_KEY_DAYS = _env_int('RETENTION_INGEST_KEY_DAYS', 30)
+    # 指定すると削除する行を NDJSON でこのディレクトリに書き出す
+    RETENTION_ARCHIVE_DIR = os.environ.get('RETENTION_ARCHIVE_DIR')
+
+    # リクエストごとのクエリ数・処理時間の計測と、遅いリクエストとして警告する閾値 (ミリ秒)
+    METRICS_ENABLED = _env_bool('METRICS_ENABLED')
+    METRICS_SLOW_REQUEST_MS = _env_int('METRICS_SLOW_REQUEST_MS', 500)
+    # /metrics に必要な Bearer トークン (未設定なら /metrics は公開しない)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    DB_POOL_SIZE = _env_int('DB_POOL_SIZE', 20)
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+
+
+config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+def get_config(name=None):
+    """
+    引数または環境変数 FOCUSFLOW_ENV で指定された設定クラスを返します。
+    """
+    name = name or os.environ.get('FOCUSFLOW_ENV', 'development')
+    return config[name]
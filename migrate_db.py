@@ -0,0 +1,22 @@
+import os
+from app import create_app
+from app import migrations
+
+def migrate_db():
+    """
+    データベースのスキーマバージョンを表示し、未適用のマイグレーションを適用します。
+    """
+    # 環境変数FLASK_APPを設定
+    os.environ['FLASK_APP'] = 'run.py'
+    # create_app で適用させると何を適用したか分からないので、ここで適用する
+    app = create_app(web=False, migrate=False)
+    with app.app_context():
+        applied = migrations.ensure_schema()
+        for number, description, _ in migrations.MIGRATIONS:
+            print(f"{number}: {description}")
+        print(f"現在のスキーマバージョン: {migrations.current_version()}")
+        if applied:
+            print(f"適用したマイグレーション: {applied}")
+
+if __name__ == '__main__':
+    migrate_db()
@@ -0,0 +1,17 @@
+import os
+from app import create_app
+from app.models import WeeklyFocus
+
+def rebuild_weekly_focus():
+    """
+    既存のフォーカスセッションから週間集計テーブルを再構築します。
+    """
+    # 環境変数FLASK_APPを設定
+    os.environ['FLASK_APP'] = 'run.py'
+    app = create_app(web=False)
+    with app.app_context():
+        count = WeeklyFocus.rebuild()
+        print(f"週間集計を再構築しました。({count} 件)")
+
+if __name__ == '__main__':
+    rebuild_weekly_focus()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+def serve(workers, host, base_port, server, message_queue):
+    """
+    指定した数のワーカープロセスを base_port から連番のポートで起動します。
+    Socket.IO はクライアントごとに同じワーカーへ接続し続ける必要があるため、
+    前段の nginx などで ip_hash によるスティッキーセッションを設定してください。
+    ワーカー間のブロードキャストと、チャットのバッファ・ステータスの更新は
+    SOCKETIO_MESSAGE_QUEUE で共有します。
+    マイグレーションはワーカーを起動する前に1度だけ適用します (各ワーカーが同時に適用すると衝突するため)。
+    """
+    env = dict(os.environ)
+    env.setdefault('FOCUSFLOW_ENV', 'production')
+    # loopback:// のポートで受信するのはここで起動するワーカーだけ
+    env['SOCKETIO_LOOPBACK_LISTEN'] = '1'
+    if message_queue:
+        env['SOCKETIO_MESSAGE_QUEUE'] = message_queue
+    elif workers > 1 and not env.get('SOCKETIO_MESSAGE_QUEUE'):
+        # キューの指定がなければ同一マシン用のループバックで代用する
+        env['SOCKETIO_MESSAGE_QUEUE'] = f'loopback://127.0.0.1:{base_port + 1000}-{base_port + 1000 + workers - 1}'
+
+    subprocess.run([sys.executable, 'migrate_db.py'], env=env, check=True)
+
+    processes = []
+    for i in range(workers):
+        port = base_port + i
+        if server == 'gunicorn':
+            # eventlet ワーカーは1プロセスにつき1つ (Socket.IO の制約)
+            command = ['gunicorn', '-k', 'eventlet', '-w', '1', '-b', f'{host}:{port}', 'run:app']
+            worker_env = env
+        else:
+            command = [sys.executable, 'run.py']
+            worker_env = dict(env, HOST=host, PORT=str(port))
+        processes.append(subprocess.Popen(command, env=worker_env))
+        print(f"ワーカー {i + 1}/{workers} を起動しました: {host}:{port}")
+    print(f"メッセージキュー: {env.get('SOCKETIO_MESSAGE_QUEUE') or 'なし'}")
+
+    def stop(signum, frame):
+        for process in processes:
+            process.terminate()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for process in processes:
+        process.wait()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='FocusFlow を複数ワーカーで起動します。')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='起動するワーカー数 (既定: CPUコア数)')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='待ち受けるアドレス')
+    parser.add_argument('--base-port', type=int, default=8000, help='最初のワーカーのポート番号')
+    parser.add_argument('--server', choices=['gunicorn', 'builtin'], default='gunicorn', help='使用するサーバー')
+    parser.add_argument('--message-queue', type=str, help='メッセージキューのURL (例: redis://localhost:6379/0)')
+
+    args = parser.parse_args()
+    serve(args.workers, args.host, args.base_port, args.server, args.message_queue)
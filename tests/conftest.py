@@ -0,0 +1,63 @@
+import pytest
+from flask_login.utils import _create_identifier
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def make_user(app):
+    def make(username):
+        # ハッシュ計算は重いのでパスワードは設定しない (ログインはセッションに直接書き込む)
+        user = User(username=username, email=f'{username}@example.com')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+@pytest.fixture
+def login(app):
+    def login(user):
+        client = app.test_client()
+        # login_user と同じ識別子がないと、セッション保護がリクエストのたびにセッションを書き換える
+        with app.test_request_context(environ_base=client.environ_base):
+            identifier = _create_identifier()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+            session['_id'] = identifier
+        return client
+    return login
+
+class QueryCounter:
+    """
+    with ブロックの中で実行された SQL 文を数えます。
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+@pytest.fixture
+def count_queries(app):
+    return QueryCounter
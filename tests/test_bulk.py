@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+from app import db, bulk, ingest
+from app.cache_stamp import cache_stamp
+from app.membership import membership
+from app.models import User, FocusRoom
+
+def _inactive_ids(since):
+    return [row[0] for row in db.session.query(User.id).filter(
+        User.id.in_(bulk.inactive_users(since))).order_by(User.id)]
+
+def test_recently_registered_users_are_not_inactive(make_user):
+    since = datetime.utcnow() - timedelta(days=30)
+    veteran = make_user('veteran')
+    veteran.created_at = since - timedelta(days=1)
+    legacy = make_user('legacy')
+    legacy.created_at = None
+    active = make_user('active')
+    active.created_at = since - timedelta(days=1)
+    make_user('newcomer')
+    ingest.record_session(active.id, 'task', 25)
+    db.session.commit()
+
+    assert _inactive_ids(since) == [veteran.id, legacy.id]
+
+def test_inactive_filter_scales_past_sqlite_parameter_limit(app):
+    since = datetime.utcnow()
+    db.session.execute(db.insert(User.__table__), [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'created_at': since - timedelta(days=1)}
+        for i in range(40000)
+    ])
+    db.session.commit()
+
+    assert len(_inactive_ids(since)) == 40000
+
+def test_web_caches_are_cleared_after_bulk_delete(app, make_user, monkeypatch):
+    monkeypatch.setattr(cache_stamp, 'interval', 0)
+    owner = make_user('owner')
+    room = FocusRoom(name='room', owner_id=owner.id)
+    room.participants.append(owner)
+    db.session.add(room)
+    db.session.commit()
+    cache_stamp.check()
+    assert membership.is_member(room.id, owner.id)
+
+    bulk.delete_rooms([room.id])
+    cache_stamp.check()
+
+    assert not membership.is_member(room.id, owner.id)
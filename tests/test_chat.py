@@ -0,0 +1,89 @@
+import pytest
+from app import db
+from app.chat import ChatWriter, chat_buffer
+from app.models import ChatMessage, FocusRoom
+from app.socket_queue import cluster
+
+@pytest.fixture
+def writer(app, monkeypatch):
+    writer = ChatWriter(app)
+    # テストではバックグラウンドの書き出しを起動しない
+    writer._started = True
+    monkeypatch.setattr('app.chat.chat_writer', writer)
+    return writer
+
+@pytest.fixture
+def room(make_user):
+    owner = make_user('owner')
+    room = FocusRoom(name='room', owner_id=owner.id)
+    db.session.add(room)
+    db.session.commit()
+    chat_buffer.evict(room.id)
+    return room, owner
+
+def test_enqueued_message_is_visible_before_flush(writer, room):
+    room, owner = room
+    chat_buffer.recent(room.id)
+    writer.enqueue(room.id, owner.id, owner.username, 'hi')
+
+    assert [m.message for m in chat_buffer.recent(room.id)] == ['hi']
+    assert chat_buffer.recent(room.id)[0].id is None
+
+    assert writer.flush() == 1
+    message = chat_buffer.recent(room.id)[0]
+    assert message.id == db.session.query(ChatMessage.id).scalar()
+
+def test_pending_messages_are_merged_when_room_is_loaded(writer, room):
+    room, owner = room
+    writer.enqueue(room.id, owner.id, owner.username, 'hey')
+
+    assert [m.message for m in chat_buffer.recent(room.id)] == ['hey']
+
+def test_messages_for_deleted_room_are_dropped(writer, room):
+    room, owner = room
+    other = FocusRoom(name='other', owner_id=owner.id)
+    db.session.add(other)
+    db.session.commit()
+    writer.enqueue(other.id, owner.id, owner.username, 'gone')
+    writer.enqueue(room.id, owner.id, owner.username, 'kept')
+    db.session.delete(other)
+    db.session.commit()
+
+    assert writer.flush() == 1
+    assert writer.depth == 0
+    assert writer.stats['dropped'] == 1
+    assert [row.message for row in ChatMessage.query.all()] == ['kept']
+
+def test_rows_failing_constraints_are_dropped_one_by_one(writer, room):
+    room, owner = room
+    writer.enqueue(room.id, owner.id, owner.username, 'ok')
+    # user_id は NOT NULL なので保存できない
+    writer.enqueue(room.id, None, 'ghost', 'bad')
+    writer.enqueue(room.id, owner.id, owner.username, 'also ok')
+
+    assert writer.flush() == 2
+    assert writer.depth == 0
+    assert writer.stats['dropped'] == 1
+    assert [row.message for row in ChatMessage.query.order_by(ChatMessage.id)] == ['ok', 'also ok']
+
+def test_messages_saved_by_other_workers_are_appended_once(writer, room):
+    room, owner = room
+    writer.enqueue(room.id, owner.id, owner.username, 'local')
+    writer.flush()
+    saved = chat_buffer.recent(room.id)[0]
+    remote = [room.id, saved.id + 1, owner.id, owner.username, 'remote', saved.timestamp.isoformat()]
+
+    cluster.dispatch('chat_messages', {'messages': [remote, remote]})
+
+    assert [m.message for m in chat_buffer.recent(room.id)] == ['local', 'remote']
+
+def test_sigterm_drains_pending_messages_before_exiting(writer, room):
+    room, owner = room
+    writer.enqueue(room.id, owner.id, owner.username, 'bye')
+    exits = []
+
+    # 元のハンドラ (gunicorn のワーカーなど) があれば、書き出した後にそれで終了する
+    writer._shutdown(lambda signum, frame: exits.append((signum, writer.depth)), 15, None)
+
+    assert exits == [(15, 0)]
+    assert [row.message for row in ChatMessage.query] == ['bye']
@@ -0,0 +1,33 @@
+from app import db, counters, ingest
+from app.models import User
+
+def _counters(user_id):
+    return db.session.query(User.total_focus_minutes, User.session_count, User.flow_state_count).filter(
+        User.id == user_id).one()
+
+def test_writes_keep_counters_in_step(make_user):
+    user = make_user('steady')
+    ingest.record_session(user.id, 'a', 25)
+    ingest.record_session(user.id, 'b', 15)
+    ingest.record_activity(user.id, 'flow_state')
+    db.session.commit()
+
+    assert tuple(_counters(user.id)) == (40, 2, 1)
+    assert counters.reconcile() == (1, 0)
+
+def test_reconcile_repairs_drift_in_one_statement_per_chunk(make_user, count_queries):
+    users = [make_user(f'drift{i}') for i in range(5)]
+    for user in users:
+        ingest.record_session(user.id, 'a', 10)
+    db.session.commit()
+    db.session.execute(db.update(User).values(total_focus_minutes=999, flow_state_count=7))
+    db.session.commit()
+
+    assert counters.reconcile(dry_run=True) == (5, 5)
+    assert tuple(_counters(users[0].id)) == (999, 1, 7)
+
+    with count_queries() as counter:
+        assert counters.reconcile(chunk_size=2) == (5, 5)
+    updates = [statement for statement in counter.statements if statement.startswith('UPDATE')]
+    assert len(updates) == 3
+    assert all(tuple(_counters(user.id)) == (10, 1, 0) for user in users)
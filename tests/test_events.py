@@ -0,0 +1,21 @@
+from app import socketio
+from app.presence import presence
+
+def test_anonymous_socket_is_rejected(app, make_user):
+    user = make_user('alice')
+    presence.update(user.id, 'フォーカス中', 77)
+
+    client = socketio.test_client(app)
+    assert not client.is_connected()
+
+def test_logged_in_socket_can_watch_user(app, make_user, login):
+    alice = make_user('alice')
+    bob = make_user('bob')
+    presence.update(alice.id, 'フォーカス中', 77)
+
+    client = socketio.test_client(app, flask_test_client=login(bob))
+    assert client.is_connected()
+    client.emit('watch_user', {'username': 'alice'})
+    received = [message for message in client.get_received() if message['name'] == 'user_status']
+    assert received[-1]['args'][0] == {'status': 'フォーカス中', 'gauge_level': 77}
+    client.disconnect()
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from datetime import datetime
+import pytest
+from app import db, export
+from app.models import FocusSession
+
+@pytest.fixture
+def history(make_user):
+    owner = make_user('exporter')
+    other = make_user('someone-else')
+    for day, minutes in ((1, 10), (2, 20), (3, 30)):
+        db.session.add(FocusSession(user_id=owner.id, task_name=f'task,{day}', duration_minutes=minutes,
+                                    timestamp=datetime(2026, 10, day, 23, 30)))
+    db.session.add(FocusSession(user_id=other.id, task_name='not mine', duration_minutes=99,
+                                timestamp=datetime(2026, 10, 2, 12, 0)))
+    db.session.commit()
+    return owner
+
+def test_csv_export_streams_own_rows_with_header(history, login):
+    response = login(history).get('/export/sessions.csv')
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert 'attachment; filename="focusflow-sessions-' in response.headers['Content-Disposition']
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['id', 'user_id', 'task_name', 'duration_minutes', 'timestamp']
+    assert [(row[2], row[3]) for row in rows[1:]] == [('task,1', '10'), ('task,2', '20'), ('task,3', '30')]
+
+def test_ndjson_export_is_limited_to_the_inclusive_date_range(history, login):
+    response = login(history).get('/export/sessions.ndjson?from=2026-10-02&to=2026-10-03')
+
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # to の日の 23:30 も含む
+    assert [record['duration_minutes'] for record in records] == [20, 30]
+    assert records[0]['timestamp'] == '2026-10-02T23:30:00'
+
+@pytest.mark.parametrize('query', ['from=2026/10/01', 'to=yesterday', 'from=2026-02-30'])
+def test_invalid_dates_are_rejected(history, login, query):
+    response = login(history).get(f'/export/sessions.csv?{query}')
+
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+@pytest.mark.parametrize('path', ['/export/users.csv', '/export/sessions.xml'])
+def test_unknown_kind_or_format_is_not_found(history, login, path):
+    assert login(history).get(path).status_code == 404
+
+def test_large_exports_are_written_in_chunks(history, monkeypatch):
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 10)
+
+    chunks = list(export.stream('sessions', 'ndjson', user_id=history.id))
+
+    assert len(chunks) == 3
+    assert sum(chunk.count('\n') for chunk in chunks) == 3
@@ -0,0 +1,47 @@
+from app import db
+from app.follow_graph import follow_graph
+from app.models import followers
+
+def _rows(user, other):
+    return db.session.query(followers).filter_by(follower_id=user.id, followed_id=other.id).count()
+
+def test_follow_with_stale_cache_does_not_duplicate(make_user):
+    alice = make_user('alice')
+    bob = make_user('bob')
+    follow_graph.clear()
+    assert not alice.is_following(bob)
+
+    # 他のワーカーでフォロー済みだが、このワーカーのキャッシュはまだ知らない
+    db.session.execute(followers.insert().values(follower_id=alice.id, followed_id=bob.id))
+    db.session.commit()
+    alice.follow(bob)
+    db.session.commit()
+
+    assert _rows(alice, bob) == 1
+    assert alice.is_following(bob)
+
+def test_unfollow_with_stale_cache_deletes_the_row(make_user):
+    alice = make_user('alice')
+    bob = make_user('bob')
+    follow_graph.clear()
+    assert not alice.is_following(bob)
+
+    db.session.execute(followers.insert().values(follower_id=alice.id, followed_id=bob.id))
+    db.session.commit()
+    alice.unfollow(bob)
+    db.session.commit()
+
+    assert _rows(alice, bob) == 0
+    assert not alice.is_following(bob)
+
+def test_follow_updates_loaded_cache(make_user):
+    alice = make_user('alice')
+    bob = make_user('bob')
+    follow_graph.clear()
+    assert follow_graph.followers(bob.id) == set()
+
+    alice.follow(bob)
+    db.session.commit()
+
+    assert follow_graph.followed(alice.id) == {bob.id}
+    assert follow_graph.followers(bob.id) == {alice.id}
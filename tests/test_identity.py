@@ -0,0 +1,37 @@
+from app import bulk
+from app.cache_stamp import cache_stamp
+from app.identity import identity_cache
+from app.metrics import metrics
+
+def test_bulk_deleted_user_is_logged_out(app, make_user, login, monkeypatch):
+    monkeypatch.setattr(cache_stamp, 'interval', 0)
+    user = make_user('leaving')
+    client = login(user)
+    # リクエストごとに別のアプリケーションコンテキスト (g と DB セッション) を使う
+    with app.app_context():
+        assert client.get('/dashboard').status_code == 200
+
+    # admin.py と同じ経路で削除する (このプロセスのキャッシュは直接触らない)
+    bulk.delete_users([user.id])
+
+    with app.app_context():
+        response = client.get('/dashboard')
+    assert response.status_code == 302
+    assert '/login' in response.headers['Location']
+
+def test_snapshot_includes_counters(app, make_user, count_queries):
+    user = make_user('counted')
+    identity_cache.store(user)
+
+    with app.app_context():
+        cached = identity_cache.load(user.id)
+        with count_queries() as counter:
+            values = (cached.total_focus_minutes, cached.session_count, cached.flow_state_count,
+                      cached.last_session_at, cached.last_seen)
+
+    assert values == (0, 0, 0, None, None)
+    assert counter.count == 0
+
+def test_cache_stats_are_exported():
+    before = identity_cache.stats['hits']
+    assert f'focusflow_identity_cache_hits_total {before}' in metrics.render()
@@ -0,0 +1,56 @@
+import time
+from sqlalchemy.exc import IntegrityError
+from app import ingest
+from app.models import FocusSession
+
+def _session_event(key, occurred_at=None):
+    return {'key': key, 'type': 'session', 'task_name': 'task', 'duration_minutes': 25,
+            'occurred_at': occurred_at if occurred_at is not None else time.time() * 1000}
+
+def test_events_older_than_the_window_are_rejected(make_user, login):
+    client = login(make_user('late'))
+    too_old = (time.time() - ingest.MAX_EVENT_AGE.total_seconds() - 60) * 1000
+
+    response = client.post('/api/ingest', json={'events': [_session_event('a'), _session_event('b', too_old)]})
+
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+    assert FocusSession.query.count() == 0
+
+def test_events_without_occurred_at_are_rejected(make_user, login):
+    client = login(make_user('undated'))
+    event = _session_event('a')
+    del event['occurred_at']
+
+    response = client.post('/api/ingest', json={'events': [event]})
+
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 0
+    assert FocusSession.query.count() == 0
+
+def test_event_queue_is_stored_per_user(app, make_user, login):
+    for user in (make_user('alice'), make_user('bob')):
+        # リクエストごとに別のアプリケーションコンテキストにして、g のログインユーザーを持ち越さない
+        with app.app_context():
+            body = login(user).get('/focus').get_data(as_text=True)
+        assert f"focusflow.pendingEvents.{user.id}'" in body
+
+def test_repeated_key_race_returns_conflict(make_user, login, monkeypatch):
+    client = login(make_user('racer'))
+
+    def conflict(user_id, events):
+        raise IntegrityError('INSERT INTO ingest_key', {}, Exception('UNIQUE constraint failed'))
+    monkeypatch.setattr(ingest, 'apply', conflict)
+
+    response = client.post('/api/ingest', json={'events': [_session_event('a')]})
+
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'error'
+
+def test_resent_batch_is_counted_once(make_user, login):
+    client = login(make_user('resend'))
+    batch = {'events': [_session_event('a')]}
+
+    assert client.post('/api/ingest', json=batch).get_json()['accepted'] == ['a']
+    assert client.post('/api/ingest', json=batch).get_json()['duplicates'] == ['a']
+    assert FocusSession.query.count() == 1
@@ -0,0 +1,51 @@
+import pytest
+from app import db
+from app.membership import RoomMembership
+from app.models import FocusRoom, room_participants
+from app.socket_queue import cluster
+
+@pytest.fixture
+def cache(app, monkeypatch):
+    cache = RoomMembership(app)
+    monkeypatch.setattr('app.membership.membership', cache)
+    return cache
+
+@pytest.fixture
+def room(make_user):
+    owner = make_user('owner')
+    room = FocusRoom(name='room', owner_id=owner.id)
+    room.participants.append(owner)
+    db.session.add(room)
+    db.session.commit()
+    return room, owner
+
+def test_removal_on_another_worker_is_applied(cache, room):
+    room, owner = room
+    assert cache.is_member(room.id, owner.id)
+
+    # 他のワーカーでキックされ、DB からも削除された
+    db.session.execute(room_participants.delete())
+    db.session.commit()
+    cluster.dispatch('membership_remove', {'room_id': room.id, 'user_id': owner.id})
+
+    assert not cache.is_member(room.id, owner.id)
+
+def test_non_member_result_is_cached(cache, room, make_user, count_queries):
+    room, _ = room
+    stranger = make_user('stranger')
+    assert not cache.is_member(room.id, stranger.id)
+
+    with count_queries() as counter:
+        assert not cache.is_member(room.id, stranger.id)
+    assert counter.count == 0
+
+def test_join_clears_cached_non_member_result(cache, room, make_user):
+    room, _ = room
+    joiner = make_user('joiner')
+    assert not cache.is_member(room.id, joiner.id)
+
+    db.session.execute(room_participants.insert().values(room_id=room.id, user_id=joiner.id))
+    db.session.commit()
+    cluster.dispatch('membership_add', {'room_id': room.id, 'user_id': joiner.id})
+
+    assert cache.is_member(room.id, joiner.id)
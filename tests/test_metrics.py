@@ -0,0 +1,34 @@
+import pytest
+from app import create_app, db
+
+def _metrics_app(monkeypatch, token):
+    monkeypatch.setattr('config.TestingConfig.METRICS_ENABLED', True, raising=False)
+    monkeypatch.setattr('config.TestingConfig.METRICS_TOKEN', token, raising=False)
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def metrics_app(monkeypatch):
+    yield from _metrics_app(monkeypatch, 'secret')
+
+@pytest.fixture
+def tokenless_app(monkeypatch):
+    yield from _metrics_app(monkeypatch, None)
+
+def test_metrics_is_readable_with_token_and_no_session(metrics_app):
+    response = metrics_app.test_client().get('/metrics', headers={'Authorization': 'Bearer secret'})
+
+    assert response.status_code == 200
+    assert 'focusflow_request_duration_seconds' in response.get_data(as_text=True)
+
+def test_metrics_rejects_missing_token(metrics_app):
+    assert metrics_app.test_client().get('/metrics').status_code == 403
+
+def test_metrics_is_not_served_without_a_token(tokenless_app):
+    # リバースプロキシ経由では外部からのリクエストも 127.0.0.1 から届く
+    response = tokenless_app.test_client().get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'})
+
+    assert response.status_code == 404
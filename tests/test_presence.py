@@ -0,0 +1,60 @@
+from datetime import timedelta
+import pytest
+from app import db
+from app.models import User
+from app.presence import PresenceRegistry, OFFLINE, _utcnow
+
+@pytest.fixture
+def registry(app):
+    registry = PresenceRegistry(app)
+    # テストではバックグラウンドの書き戻しを起動しない
+    registry._started = True
+    return registry
+
+def test_stale_status_in_database_is_reported_offline(registry, make_user):
+    user = make_user('stale')
+    user.status = 'フォーカス中'
+    user.current_gauge_level = 80
+    user.last_seen = _utcnow() - timedelta(seconds=registry.ttl + registry.flush_interval + 1)
+    db.session.commit()
+
+    assert registry.get(user) == (OFFLINE, 0)
+
+    user.last_seen = _utcnow()
+    db.session.commit()
+    assert registry.get(user) == ('フォーカス中', 80)
+
+def test_flush_writes_status_and_last_seen(registry, make_user):
+    user = make_user('writer')
+    registry.update(user.id, 'フォーカス中', 40)
+
+    assert registry.flush() == 1
+    row = db.session.query(User.status, User.current_gauge_level, User.last_seen).filter_by(id=user.id).one()
+    assert row[:2] == ('フォーカス中', 40)
+    assert row.last_seen is not None
+    assert registry.flush() == 0
+
+def test_failed_flush_keeps_updates_for_retry(registry, make_user, monkeypatch):
+    user = make_user('retry')
+    registry.update(user.id, 'フォーカス中', 10)
+
+    def fail():
+        raise RuntimeError('commit failed')
+    monkeypatch.setattr(db.session, 'commit', fail)
+    with pytest.raises(RuntimeError):
+        registry.flush()
+    monkeypatch.undo()
+    db.session.rollback()
+
+    assert registry.flush() == 1
+    assert db.session.get(User, user.id).status == 'フォーカス中'
+
+def test_heartbeat_from_another_worker_replaces_local_entry(registry, make_user):
+    user = make_user('moved')
+    registry.update(user.id, 'フォーカス中', 30)
+
+    registry.apply_remote(user.id, 'フロー状態', 90)
+
+    assert registry.get(user) == ('フロー状態', 90)
+    # 書き戻しは相手のワーカーが行う
+    assert registry.flush() == 0
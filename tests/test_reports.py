@@ -0,0 +1,50 @@
+import pytest
+from app import db, ingest, reports
+from app.follow_graph import follow_graph
+from app.report_cache import report_cache
+
+# /report 1回あたりの SQL 文の上限 (累計・フォロー・日別2本・直近セッションの5本 + ログインユーザーの読み込み)
+REPORT_QUERY_LIMIT = 6
+
+def _log_sessions(user, count):
+    for i in range(count):
+        ingest.record_session(user.id, f'task {i}', 25)
+        ingest.record_activity(user.id, 'flow_state')
+    db.session.commit()
+
+@pytest.mark.parametrize('sessions, followed', [(0, 0), (3, 1), (40, 8)])
+def test_report_query_count_does_not_grow_with_history(make_user, login, count_queries, sessions, followed):
+    follow_graph.clear()
+    user = make_user('reader')
+    _log_sessions(user, sessions)
+    follow_graph.followed(user.id)
+    for i in range(followed):
+        other = make_user(f'friend{i}')
+        _log_sessions(other, 2)
+        user.follow(other)
+    db.session.commit()
+    # 読み込み済みのフォロー関係のキャッシュにも follow が反映され、フォロー中のユーザーが集計に入る
+    followed_avg_data = reports.daily_series(user.id)[3]
+    assert (sum(followed_avg_data) > 0) == (followed > 0)
+    client = login(user)
+    report_cache.invalidate(user.id)
+
+    with count_queries() as counter:
+        response = client.get('/report')
+
+    assert response.status_code == 200
+    assert counter.count <= REPORT_QUERY_LIMIT, '\n'.join(counter.statements)
+
+def test_report_is_served_from_snapshot_on_repeat_view(make_user, login, count_queries):
+    user = make_user('repeat')
+    _log_sessions(user, 5)
+    client = login(user)
+    report_cache.invalidate(user.id)
+    client.get('/report')
+
+    with count_queries() as counter:
+        response = client.get('/report')
+
+    assert response.status_code == 200
+    # 2回目はログインユーザーの読み込み以外に SQL を発行しない
+    assert counter.count <= 1, '\n'.join(counter.statements)
@@ -0,0 +1,38 @@
+import pytest
+from app.response_cache import response_cache
+
+@pytest.fixture
+def client(app, make_user, login):
+    response_cache.clear()
+    return login(make_user('ranker'))
+
+def _get(app, client, url, **kwargs):
+    # リクエストごとに別のアプリケーションコンテキストにして、g のログインユーザーを持ち越さない
+    with app.app_context():
+        return client.get(url, **kwargs)
+
+def test_matching_etag_returns_not_modified_without_rendering(app, client, count_queries):
+    first = _get(app, client, '/leaderboard')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    with count_queries() as counter:
+        second = _get(app, client, '/leaderboard', headers={'If-None-Match': first.headers['ETag']})
+
+    assert second.status_code == 304
+    assert second.get_data() == b''
+    # ログインユーザーの読み込み以外に SQL を発行しない
+    assert counter.count <= 1, '\n'.join(counter.statements)
+
+def test_bumped_scope_serves_fresh_page_and_etag(app, client):
+    first = _get(app, client, '/leaderboard')
+    assert '42' not in first.get_data(as_text=True)
+
+    with app.app_context():
+        response = client.post('/log_session', json={'task_name': 'write', 'duration_minutes': 42})
+    assert response.status_code == 200
+
+    second = _get(app, client, '/leaderboard', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert '42' in second.get_data(as_text=True)
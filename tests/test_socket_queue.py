@@ -0,0 +1,74 @@
+import json
+from app.socket_queue import SyncMixin, ClusterSync, LoopbackManager, SYNC_METHOD, cluster, socketio_options
+
+class _FakeQueue:
+    host_id = 'self'
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.published = []
+
+    def _listen(self):
+        yield from self.messages
+
+    def _publish(self, data):
+        self.published.append(data)
+
+
+class _SyncQueue(SyncMixin, _FakeQueue):
+    pass
+
+
+def test_sync_messages_are_dispatched_and_not_passed_to_socketio(monkeypatch):
+    received = []
+    sync = ClusterSync()
+    sync.on('ping')(lambda **payload: received.append(payload))
+    monkeypatch.setattr('app.socket_queue.cluster', sync)
+
+    emit = json.dumps({'method': 'emit', 'event': 'x'})
+    queue = _SyncQueue([
+        emit,
+        json.dumps({'method': SYNC_METHOD, 'host_id': 'other', 'kind': 'ping', 'payload': {'n': 1}}),
+        # 自分が送ったものは反映しない
+        json.dumps({'method': SYNC_METHOD, 'host_id': 'self', 'kind': 'ping', 'payload': {'n': 2}}).encode(),
+    ])
+
+    assert list(queue._listen()) == [emit]
+    assert received == [{'n': 1}]
+
+def test_publish_goes_through_the_queue():
+    queue = _SyncQueue([])
+    sync = ClusterSync()
+    sync.publish('ping', n=1)  # キューがなければ何もしない
+    sync.manager = queue
+    sync.publish('ping', n=1)
+
+    assert queue.published == [{'method': SYNC_METHOD, 'host_id': 'self', 'kind': 'ping', 'payload': {'n': 1}}]
+
+def test_loopback_listens_only_in_served_workers(app):
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = 'loopback://127.0.0.1:15800-15801'
+    try:
+        manager = socketio_options(app)['client_manager']
+        assert isinstance(manager, LoopbackManager) and isinstance(manager, SyncMixin)
+        assert manager.port is None
+
+        app.config['SOCKETIO_LOOPBACK_LISTEN'] = True
+        manager = socketio_options(app)['client_manager']
+        assert manager.port == 15800
+        manager.sock.close()
+    finally:
+        cluster.manager = None
+
+def test_loopback_listener_blocks_until_a_message_arrives():
+    class _Server:
+        async_mode = 'threading'
+
+    receiver = LoopbackManager('loopback://127.0.0.1:15810-15811', channel='test')
+    sender = LoopbackManager('loopback://127.0.0.1:15810-15811', channel='test', write_only=True)
+    receiver.server = _Server()
+    try:
+        sender._publish({'method': 'emit', 'event': 'x'})
+        assert next(receiver._listen()) == {'method': 'emit', 'event': 'x'}
+    finally:
+        receiver.sock.close()
+        sender.sock.close()
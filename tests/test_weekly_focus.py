@@ -0,0 +1,29 @@
+import time
+from datetime import datetime, date
+import pytest
+from app import db, ingest
+from app.models import WeeklyFocus
+
+@pytest.fixture
+def tokyo(monkeypatch):
+    monkeypatch.setenv('TZ', 'Asia/Tokyo')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def _weeks():
+    return sorted(db.session.query(WeeklyFocus.user_id, WeeklyFocus.week_start, WeeklyFocus.minutes))
+
+def test_rebuild_uses_the_same_week_as_recording(tokyo, make_user):
+    user = make_user('night-owl')
+    # 日曜 20:00 UTC は日本時間では月曜 5:00 (次の週)
+    ingest.record_session(user.id, 'late', 30, datetime(2026, 10, 18, 20, 0))
+    ingest.record_session(user.id, 'early', 15, datetime(2026, 10, 18, 10, 0))
+    db.session.commit()
+    recorded = _weeks()
+
+    WeeklyFocus.rebuild()
+
+    assert _weeks() == recorded
+    assert recorded == [(user.id, date(2026, 10, 12), 15), (user.id, date(2026, 10, 19), 30)]